@@ -0,0 +1,12 @@
+"""
+性能基准测试
+
+- corpus: 生成确定性的测试语料（与 decrypt_data 相同的 salt(16)+IV(16)+AES-CBC/PKCS7 格式）
+- run:    针对语料运行 derive_key / decrypt_data / decrypt_file / decrypt_directory / main_cli，
+          输出吞吐量、峰值内存和各阶段耗时的 JSON 结果，便于在版本之间对比
+
+用法:
+    python -m benchmarks.corpus bench_corpus
+    python -m benchmarks.run bench_corpus -o result.json
+    python -m benchmarks.run bench_corpus --compare old.json
+"""
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+基准测试语料生成器
+
+生成的文件与 decrypt.py 期望的格式完全一致: salt(16) + IV(16) + AES-256-CBC 密文 (PKCS7 填充)，
+密钥由 PBKDF2-HMAC-SHA256 (100,000 次迭代) 派生。所有内容（明文、salt、IV）都来自固定种子的
+随机数生成器，相同参数总是生成相同的语料。
+
+语料目录结构:
+    tiny/     大量小文件
+    huge/     少量大文件（流式加密，生成时内存占用恒定）
+    mixed/    多层目录，混合加密文件与普通文件
+    wrong/    使用另一个密码加密的文件（模拟密码错误）
+    manifest.json
+"""
+
+import os
+import sys
+import json
+import random
+import hashlib
+import argparse
+
+try:
+    from Crypto.Cipher import AES
+except ImportError:
+    # 由入口函数提示安装
+    pass
+
+PASSWORD = "123456"
+WRONG_PASSWORD = "wrong-password"
+ITERATIONS = 100000
+CHUNK = 1024 * 1024
+
+
+def encrypt_stream(write, plaintext_chunks, password, rng):
+    """将明文分块流式加密，按 salt + IV + 密文 的顺序调用 write 写出，返回写出的字节数"""
+    salt = rng.randbytes(16)
+    iv = rng.randbytes(16)
+    key = hashlib.pbkdf2_hmac('sha256', password.encode(), salt, ITERATIONS, dklen=32)
+    cipher = AES.new(key, AES.MODE_CBC, iv)
+    written = write(salt + iv)
+    pending = b''
+    for chunk in plaintext_chunks:
+        data = pending + chunk
+        cut = len(data) - len(data) % 16
+        if cut:
+            written += write(cipher.encrypt(data[:cut]))
+        pending = data[cut:]
+    pad_len = 16 - len(pending)
+    written += write(cipher.encrypt(pending + bytes([pad_len]) * pad_len))
+    return written
+
+
+def encrypt_bytes(plaintext, password=PASSWORD, rng=None):
+    """加密内存中的明文，返回完整的加密文件内容"""
+    rng = rng or random.Random(0)
+    out = []
+    encrypt_stream(lambda b: out.append(b) or len(b), [plaintext], password, rng)
+    return b''.join(out)
+
+
+def _random_chunks(rng, size):
+    remaining = size
+    while remaining > 0:
+        n = min(CHUNK, remaining)
+        yield rng.randbytes(n)
+        remaining -= n
+
+
+def write_encrypted_file(path, size, rng, password=PASSWORD):
+    """写出一个明文大小为 size 的加密文件，返回 (密文大小, 明文 sha256)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    digest = hashlib.sha256()
+
+    def chunks():
+        for chunk in _random_chunks(rng, size):
+            digest.update(chunk)
+            yield chunk
+
+    with open(path, 'wb') as f:
+        written = encrypt_stream(f.write, chunks(), password, rng)
+    return written, digest.hexdigest()
+
+
+def write_plain_file(path, size, rng):
+    """写出一个普通（未加密）文件，长度刻意不按分组对齐"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if size % 16 == 0:
+        size += 1
+    with open(path, 'wb') as f:
+        for chunk in _random_chunks(rng, size):
+            f.write(chunk)
+    return size
+
+
+def generate_corpus(root, seed=0, tiny_count=200, tiny_size=4096, huge_count=2, huge_mb=64,
+                    mixed_count=100, mixed_depth=3, wrong_count=20):
+    """生成完整语料并写出 manifest.json，返回 manifest 字典"""
+    rng = random.Random(seed)
+    manifest = {'seed': seed, 'password': PASSWORD, 'sets': {}}
+
+    def record(name, files):
+        manifest['sets'][name] = {
+            'files': len(files),
+            'encrypted_files': sum(1 for f in files if f['encrypted']),
+            'bytes': sum(f['size'] for f in files),
+            'entries': files,
+        }
+
+    files = []
+    for i in range(tiny_count):
+        rel = os.path.join('tiny', f'file_{i:06d}.bin.enc')
+        size, sha = write_encrypted_file(os.path.join(root, rel), rng.randint(1, tiny_size), rng)
+        files.append({'path': rel, 'size': size, 'encrypted': True, 'sha256': sha})
+    record('tiny', files)
+
+    files = []
+    for i in range(huge_count):
+        rel = os.path.join('huge', f'huge_{i:02d}.bin.enc')
+        size, sha = write_encrypted_file(os.path.join(root, rel), huge_mb * 1024 * 1024 + 7, rng)
+        files.append({'path': rel, 'size': size, 'encrypted': True, 'sha256': sha})
+    record('huge', files)
+
+    files = []
+    for i in range(mixed_count):
+        parts = [f'd{rng.randrange(4)}' for _ in range(rng.randrange(mixed_depth + 1))]
+        if rng.random() < 0.75:
+            rel = os.path.join('mixed', *parts, f'doc_{i:05d}.dat.enc')
+            size, sha = write_encrypted_file(os.path.join(root, rel), rng.randint(1, 256 * 1024), rng)
+            files.append({'path': rel, 'size': size, 'encrypted': True, 'sha256': sha})
+        else:
+            rel = os.path.join('mixed', *parts, f'plain_{i:05d}.txt')
+            size = write_plain_file(os.path.join(root, rel), rng.randint(1, 64 * 1024), rng)
+            files.append({'path': rel, 'size': size, 'encrypted': False, 'sha256': None})
+    record('mixed', files)
+
+    files = []
+    for i in range(wrong_count):
+        rel = os.path.join('wrong', f'wrong_{i:04d}.bin.enc')
+        size, sha = write_encrypted_file(os.path.join(root, rel), rng.randint(1, 1024 * 1024), rng, WRONG_PASSWORD)
+        files.append({'path': rel, 'size': size, 'encrypted': True, 'sha256': sha})
+    record('wrong', files)
+
+    with open(os.path.join(root, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    if 'Crypto' not in sys.modules:
+        print("错误: 缺少 'pycryptodome' 库。请运行: pip install pycryptodome")
+        sys.exit(1)
+
+    parser = argparse.ArgumentParser(description="生成基准测试用的加密语料")
+    parser.add_argument("output", help="语料输出目录")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子，默认为0")
+    parser.add_argument("--tiny-count", type=int, default=200, help="小文件数量")
+    parser.add_argument("--tiny-size", type=int, default=4096, help="小文件最大明文字节数")
+    parser.add_argument("--huge-count", type=int, default=2, help="大文件数量")
+    parser.add_argument("--huge-mb", type=int, default=64, help="每个大文件的明文大小 (MB)")
+    parser.add_argument("--mixed-count", type=int, default=100, help="混合目录树中的文件数量")
+    parser.add_argument("--wrong-count", type=int, default=20, help="密码错误的文件数量")
+    args = parser.parse_args()
+
+    if os.path.exists(args.output) and os.listdir(args.output):
+        print(f"错误: 输出目录非空: {args.output}")
+        sys.exit(1)
+
+    manifest = generate_corpus(args.output, args.seed, args.tiny_count, args.tiny_size, args.huge_count,
+                               args.huge_mb, args.mixed_count, wrong_count=args.wrong_count)
+    for name, info in manifest['sets'].items():
+        print(f"{name}: {info['files']} 个文件, {info['bytes'] / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+基准测试运行器
+
+针对 benchmarks.corpus 生成的语料依次运行各个阶段，每个阶段在独立的子进程中执行，
+因此报告的峰值内存 (peak RSS) 只属于该阶段。结果以 JSON 输出，可用 --compare 与之前的结果对比。
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+import decrypt  # noqa: E402
+
+try:
+    import resource
+except ImportError:
+    # Windows 上没有 resource 模块，峰值内存记为 None
+    resource = None
+
+STAGES = [
+    'derive_key',
+    'decrypt_data',
+    'decrypt_file',
+    'decrypt_directory_tiny',
+    'decrypt_directory_mixed',
+    'decrypt_directory_wrong',
+    'main_cli',
+]
+
+
+def _peak_rss_bytes(children=False):
+    """返回当前进程（或已结束子进程）的峰值常驻内存，单位字节"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # Linux 上 ru_maxrss 以 KB 为单位，macOS 上以字节为单位
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+
+def _load_manifest(corpus):
+    with open(os.path.join(corpus, 'manifest.json'), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _timed(func, repeat):
+    """运行 func repeat 次（每次前清空派生密钥缓存），返回每次耗时和最后一次的返回值"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        decrypt.get_key_cache().clear()
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return times, result
+
+
+def _result(stage, times, files=0, nbytes=0, **extra):
+    best = min(times)
+    return {
+        'stage': stage,
+        'seconds': best,
+        'runs': times,
+        'files': files,
+        'bytes': nbytes,
+        'mb_per_s': nbytes / best / 1024 / 1024 if nbytes and best else None,
+        'files_per_s': files / best if files and best else None,
+        'extra': extra,
+    }
+
+
+def stage_derive_key(corpus, manifest, workers, repeat):
+    calls = 10
+    salts = [os.urandom(16) for _ in range(calls)]
+    times, _ = _timed(lambda: [decrypt.derive_key(decrypt_password(manifest), salt) for salt in salts], repeat)
+    return _result('derive_key', times, ms_per_call=min(times) / calls * 1000, calls=calls)
+
+
+def stage_decrypt_data(corpus, manifest, workers, repeat):
+    entry = manifest['sets']['huge']['entries'][0]
+    with open(os.path.join(corpus, entry['path']), 'rb') as f:
+        data = f.read()
+    times, _ = _timed(lambda: decrypt.decrypt_data(data, decrypt_password(manifest), workers), repeat)
+    return _result('decrypt_data', times, 1, len(data), workers=workers)
+
+
+def stage_decrypt_file(corpus, manifest, workers, repeat):
+    entries = manifest['sets']['huge']['entries']
+    with tempfile.TemporaryDirectory(prefix='bench_') as tmp:
+        def run():
+            for entry in entries:
+                output = os.path.join(tmp, os.path.basename(entry['path']) + '.out')
+                success, message = decrypt.decrypt_file(os.path.join(corpus, entry['path']), output,
+                                                        decrypt_password(manifest), keep_original=True,
+                                                        workers=workers)
+                if not success:
+                    raise RuntimeError(message)
+                os.remove(output)
+        times, _ = _timed(run, repeat)
+    return _result('decrypt_file', times, len(entries), sum(e['size'] for e in entries), workers=workers)
+
+
+def _stage_directory(set_name):
+    def stage(corpus, manifest, workers, repeat):
+        info = manifest['sets'][set_name]
+        with tempfile.TemporaryDirectory(prefix='bench_') as tmp:
+            def run():
+                output = os.path.join(tmp, 'out')
+                result = decrypt.decrypt_directory(os.path.join(corpus, set_name), decrypt_password(manifest),
+                                                   recursive=True, keep_original=True, output_dir=output,
+                                                   workers=workers)
+                shutil.rmtree(output, ignore_errors=True)
+                return result
+            times, (success, message) = _timed(run, repeat)
+        return _result(f'decrypt_directory_{set_name}', times, info['files'], info['bytes'],
+                       workers=workers, success=success, message=message)
+    return stage
+
+
+def stage_main_cli(corpus, manifest, workers, repeat):
+    info = manifest['sets']['mixed']
+    script = os.path.join(REPO_ROOT, 'decrypt.py')
+    with tempfile.TemporaryDirectory(prefix='bench_') as tmp:
+        def run():
+            output = os.path.join(tmp, 'out')
+            subprocess.run([sys.executable, script, '-d', os.path.join(corpus, 'mixed'), '-r', '-k',
+                            '-o', output, '-j', str(workers), '-p', decrypt_password(manifest)],
+                           check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            shutil.rmtree(output, ignore_errors=True)
+        times, _ = _timed(run, repeat)
+    return _result('main_cli', times, info['files'], info['bytes'], workers=workers)
+
+
+def decrypt_password(manifest):
+    return manifest.get('password', '123456')
+
+
+STAGE_FUNCS = {
+    'derive_key': stage_derive_key,
+    'decrypt_data': stage_decrypt_data,
+    'decrypt_file': stage_decrypt_file,
+    'decrypt_directory_tiny': _stage_directory('tiny'),
+    'decrypt_directory_mixed': _stage_directory('mixed'),
+    'decrypt_directory_wrong': _stage_directory('wrong'),
+    'main_cli': stage_main_cli,
+}
+
+
+def run_stage_in_process(stage, corpus, workers, repeat):
+    """在当前进程中运行单个阶段（由子进程调用），返回结果字典"""
+    result = STAGE_FUNCS[stage](corpus, _load_manifest(corpus), workers, repeat)
+    result['peak_rss_bytes'] = _peak_rss_bytes(children=(stage == 'main_cli'))
+    return result
+
+
+def run_stage(stage, corpus, workers, repeat):
+    """在独立子进程中运行单个阶段，使峰值内存互不影响"""
+    proc = subprocess.run([sys.executable, '-m', 'benchmarks.run', corpus, '--stage', stage,
+                           '-j', str(workers), '--repeat', str(repeat)],
+                          cwd=REPO_ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {'stage': stage, 'error': proc.stderr.strip().splitlines()[-1:] or ['未知错误']}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def compare(old, new):
+    """打印新旧结果的吞吐量比值"""
+    old_stages = {r['stage']: r for r in old.get('results', [])}
+    print(f"{'阶段':<28}{'旧 (s)':>10}{'新 (s)':>10}{'加速比':>10}")
+    for result in new['results']:
+        before = old_stages.get(result['stage'])
+        if not before or 'seconds' not in before or 'seconds' not in result:
+            continue
+        ratio = before['seconds'] / result['seconds'] if result['seconds'] else float('inf')
+        print(f"{result['stage']:<28}{before['seconds']:>10.3f}{result['seconds']:>10.3f}{ratio:>9.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="运行解密性能基准测试")
+    parser.add_argument("corpus", help="benchmarks.corpus 生成的语料目录")
+    parser.add_argument("-o", "--output", help="将 JSON 结果写入该文件（默认输出到标准输出）")
+    parser.add_argument("-s", "--stages", nargs='+', choices=STAGES, default=STAGES, help="要运行的阶段")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="目录解密阶段的并行任务数")
+    parser.add_argument("--repeat", type=int, default=3, help="每个阶段重复次数，取最快的一次")
+    parser.add_argument("--compare", help="与之前保存的 JSON 结果对比")
+    parser.add_argument("--stage", choices=STAGES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.stage:
+        print(json.dumps(run_stage_in_process(args.stage, args.corpus, args.jobs, args.repeat)))
+        return
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'workers': args.jobs,
+        'repeat': args.repeat,
+        'results': [],
+    }
+    for stage in args.stages:
+        print(f"运行阶段: {stage} ...", file=sys.stderr)
+        report['results'].append(run_stage(stage, args.corpus, args.jobs, args.repeat))
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,138 +10,3017 @@
 import os
 import sys
 import argparse
+import asyncio
+import ctypes
+import ctypes.util
+import errno
+import functools
 import hashlib
-from pathlib import Path
+import hmac
+import html
+import io
+import json
+import mimetypes
+import mmap
+import queue
+import select
+import shutil
+import sqlite3
+import struct
+import threading
+import time
+import heapq
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, as_completed, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote, urlsplit
 
 # 让调用方（GUI或CLI的main函数）来处理这个错误。
 try:
     from Crypto.Cipher import AES
-    from Crypto.Util.Padding import unpad
 except ImportError:
     # Pass here, the error will be caught by the calling script's entry point.
     pass
 
-# --- Core Decryption Functions (Silent, for Library Use) ---
+# --- Constants ---
+
+SALT_SIZE = 16
+IV_SIZE = 16
+HEADER_SIZE = SALT_SIZE + IV_SIZE   # 文件头: salt(16) + IV(16)
+BLOCK_SIZE = 16                     # AES 分组长度
+CHUNK_SIZE = 1024 * 1024            # 流式解密每次读取的字节数（必须是 BLOCK_SIZE 的整数倍）
+KDF_ITERATIONS = 100000             # PBKDF2 迭代次数
+PIPELINE_DEPTH = 3                  # 流水线解密每个阶段的缓冲区个数
+PIPELINE_MIN_SIZE = 16 * 1024 * 1024  # 不小于该大小的文件使用流水线解密
+SEGMENT_SIZE = 32 * 1024 * 1024     # 多核并行解密时每段的密文字节数（必须是 BLOCK_SIZE 的整数倍）
+PARALLEL_MIN_SIZE = 64 * 1024 * 1024  # 指定多个 workers 时，不小于该大小的文件按段并行解密
+KEYSTORE_SECRET_ENV = "BAIDU_DECRYPT_KEYSTORE_SECRET"
+BACKEND_ENV = "BAIDU_DECRYPT_BACKEND"    # 加密后端: auto / pycryptodome / cryptography / pure
+
+# --- Instrumentation ---
+
+class RunStats:
+    """
+    一次解密运行的结构化统计（线程安全）。
+
+    各阶段通过 record(stage, seconds, nbytes) 上报耗时和字节数，阶段包括:
+    kdf（PBKDF2）、keystore（持久密钥库查找）、read（读取）、aes（解密）、write（写出）、
+    copy / rename / link（普通文件的复制、重命名、硬链接）、sync（fsync / 批量同步）、remove（删除原始文件）。使用 mmap 读取时页缓存的缺页读取发生在
+    解密过程中，因此计入 aes 阶段。hook(stage, seconds, nbytes) 可用于接入外部监控。
+    """
+
+    SIZE_BUCKETS = (
+        (1024, "<1KB"),
+        (64 * 1024, "1KB-64KB"),
+        (1024 * 1024, "64KB-1MB"),
+        (16 * 1024 * 1024, "1MB-16MB"),
+        (256 * 1024 * 1024, "16MB-256MB"),
+        (4 * 1024 * 1024 * 1024, "256MB-4GB"),
+        (float('inf'), ">=4GB"),
+    )
+
+    def __init__(self, hook=None, slowest=10):
+        self.hook = hook
+        self.slowest_limit = slowest
+        self.stage_seconds = {}
+        self.stage_bytes = {}
+        self.stage_calls = {}
+        self.outcomes = {}
+        self.files = 0
+        self.bytes = 0
+        self.size_histogram = {label: 0 for _, label in self.SIZE_BUCKETS}
+        self.elapsed = None
+        self._slowest = []
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def stage(self, name, nbytes=0):
+        """计时上下文管理器: with stats.stage('copy', size): ..."""
+        return _StageTimer(self, name, nbytes)
+
+    def record(self, stage, seconds, nbytes=0):
+        """累计某个阶段的耗时和字节数"""
+        with self._lock:
+            self.stage_seconds[stage] = self.stage_seconds.get(stage, 0.0) + seconds
+            self.stage_bytes[stage] = self.stage_bytes.get(stage, 0) + nbytes
+            self.stage_calls[stage] = self.stage_calls.get(stage, 0) + 1
+        if self.hook:
+            self.hook(stage, seconds, nbytes)
+
+    def add_file(self, file_path, file_size, seconds, outcome):
+        """记录一个处理完成的文件"""
+        with self._lock:
+            self.files += 1
+            self.bytes += file_size
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            for limit, label in self.SIZE_BUCKETS:
+                if file_size < limit:
+                    self.size_histogram[label] += 1
+                    break
+            entry = (seconds, file_path, file_size)
+            if len(self._slowest) < self.slowest_limit:
+                heapq.heappush(self._slowest, entry)
+            elif self.slowest_limit:
+                heapq.heappushpop(self._slowest, entry)
+
+    def finish(self):
+        """结束计时"""
+        self.elapsed = time.perf_counter() - self._started
+
+    def to_dict(self):
+        """返回可直接序列化为 JSON 的统计结果"""
+        with self._lock:
+            elapsed = self.elapsed if self.elapsed is not None else time.perf_counter() - self._started
+            return {
+                'elapsed_seconds': elapsed,
+                'files': self.files,
+                'bytes': self.bytes,
+                'files_per_second': self.files / elapsed if elapsed else None,
+                'mb_per_second': self.bytes / elapsed / 1024 / 1024 if elapsed else None,
+                'outcomes': dict(self.outcomes),
+                'stages': {
+                    stage: {
+                        'seconds': self.stage_seconds[stage],
+                        'bytes': self.stage_bytes[stage],
+                        'calls': self.stage_calls[stage],
+                    }
+                    for stage in self.stage_seconds
+                },
+                'size_histogram': dict(self.size_histogram),
+                'slowest_files': [
+                    {'path': path, 'size': size, 'seconds': seconds}
+                    for seconds, path, size in sorted(self._slowest, reverse=True)
+                ],
+                'crypto_backend': backend_info(),
+            }
+
+
+class _StageTimer:
+    def __init__(self, stats, name, nbytes):
+        self.stats = stats
+        self.name = name
+        self.nbytes = nbytes
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.record(self.name, time.perf_counter() - self.start, self.nbytes)
+        return False
+
+
+class _NullStats:
+    """未启用统计时使用的空实现，避免在各处判断 stats 是否为 None"""
+
+    def stage(self, name, nbytes=0):
+        return _NULL_TIMER
+
+    def record(self, stage, seconds, nbytes=0):
+        pass
+
+    def add_file(self, file_path, file_size, seconds, outcome):
+        pass
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+NO_STATS = _NullStats()
+
+
+class BatchProgress:
+    """
+    批量处理的进度（线程安全），按字节计量。
+
+    扫描线程上报发现的文件，处理线程在解密过程中按分块上报已处理的字节（大文件内部也会推进），
+    界面可以按自己的节奏调用 snapshot() 读取，不会为每个文件产生一次事件。
+    也可以传入 callback(bytes_done, bytes_total, files_done, files_total)，它最多每 interval 秒
+    调用一次（可能在工作线程中调用，调用之间不会重叠），结束时由 notify() 保证再调用一次。
+    """
+
+    def __init__(self, callback=None, interval=0.2):
+        self.files_done = 0
+        self.files_total = 0
+        self.bytes_done = 0
+        self.bytes_total = 0
+        self.scan_finished = False
+        self.callback = callback
+        self.interval = interval
+        self._last_notify = 0.0
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self._notify_lock = threading.Lock()
+
+    def add_discovered(self, nbytes):
+        """扫描到一个待处理的文件"""
+        with self._lock:
+            self.files_total += 1
+            self.bytes_total += nbytes
+        self._maybe_notify()
+
+    def finish_scan(self):
+        """扫描结束，此后 files_total / bytes_total 即为最终总数"""
+        self.scan_finished = True
+
+    def add_bytes(self, nbytes):
+        """文件处理过程中推进已处理的字节数"""
+        with self._lock:
+            self.bytes_done += nbytes
+        self._maybe_notify()
+
+    def file_done(self, nbytes):
+        """处理完成一个文件；nbytes 为该文件尚未通过 add_bytes 上报的字节数"""
+        with self._lock:
+            self.files_done += 1
+            self.bytes_done += nbytes
+        self._maybe_notify()
+
+    def notify(self):
+        """立即调用一次 callback（用于处理结束时）"""
+        self._maybe_notify(force=True)
+
+    def _maybe_notify(self, force=False):
+        if not self.callback:
+            return
+        now = time.perf_counter()
+        if not force and now - self._last_notify < self.interval:
+            return
+        # 其他线程正在回调时直接跳过（进度是累计值，下次回调会包含这次的变化）
+        if not self._notify_lock.acquire(blocking=force):
+            return
+        try:
+            self._last_notify = now
+            with self._lock:
+                values = (self.bytes_done, self.bytes_total, self.files_done, self.files_total)
+            self.callback(*values)
+        finally:
+            self._notify_lock.release()
+
+    def snapshot(self):
+        """返回当前进度，包括速度 (字节/秒) 和预计剩余时间 (秒，扫描未完成或无法估计时为 None)"""
+        with self._lock:
+            files_done, files_total = self.files_done, self.files_total
+            bytes_done, bytes_total = self.bytes_done, self.bytes_total
+        elapsed = time.perf_counter() - self._started
+        rate = bytes_done / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.scan_finished and rate > 0:
+            eta = max(0.0, (bytes_total - bytes_done) / rate)
+        return {
+            'files_done': files_done,
+            'files_total': files_total,
+            'bytes_done': bytes_done,
+            'bytes_total': bytes_total,
+            'scan_finished': self.scan_finished,
+            'elapsed': elapsed,
+            'bytes_per_second': rate,
+            'eta': eta,
+        }
+
+
+class _FileProgress:
+    """
+    处理单个文件时使用的统计对象：透传给实际的统计对象，同时把解密的分块字节数转发给 BatchProgress，
+    使进度在大文件内部也能推进。并行解密时多个段线程会同时上报，reported 的累加需要加锁。
+    """
+
+    def __init__(self, stats, progress):
+        self.stats = stats
+        self.progress = progress
+        self.reported = 0
+        self._lock = threading.Lock()
+
+    def stage(self, name, nbytes=0):
+        return _StageTimer(self, name, nbytes)
+
+    def record(self, stage, seconds, nbytes=0):
+        self.stats.record(stage, seconds, nbytes)
+        if stage == 'aes' and nbytes:
+            with self._lock:
+                self.reported += nbytes
+            self.progress.add_bytes(nbytes)
+
+    def add_file(self, file_path, file_size, seconds, outcome):
+        self.stats.add_file(file_path, file_size, seconds, outcome)
+
+    def file_done(self, file_size):
+        """文件处理结束，补齐未通过分块上报的字节（文件头、最后一个分组、复制的文件等）"""
+        with self._lock:
+            reported = self.reported
+        self.progress.file_done(max(0, file_size - reported))
+
+def format_size(nbytes):
+    """将字节数格式化为易读的形式，如 1.5 GB"""
+    size = float(nbytes)
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if size < 1024 or unit == "TB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+def format_duration(seconds):
+    """将秒数格式化为 HH:MM:SS"""
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+# --- Crypto Backends ---
+
+class _PycryptodomeBackend:
+    """pycryptodome 的 AES-CBC；PBKDF2 使用 hashlib（OpenSSL 实现，比 pycryptodome 自带的更快）"""
+
+    name = 'pycryptodome'
+
+    def __init__(self):
+        from Crypto.Cipher import AES as _AES
+        self._aes = _AES
+
+    def cbc_decryptor(self, key, iv):
+        return self._aes.new(key, self._aes.MODE_CBC, iv)
+
+    def cbc_encryptor(self, key, iv):
+        return self._aes.new(key, self._aes.MODE_CBC, iv)
+
+    def pbkdf2_sha256(self, password, salt, iterations, dklen):
+        return hashlib.pbkdf2_hmac('sha256', password, salt, iterations, dklen=dklen)
+
+
+class _CryptographyCBC:
+    """把 cryptography 的 CipherContext 包装成与 pycryptodome 相同的 decrypt / encrypt(data, output=None) 接口"""
+
+    def __init__(self, context):
+        self._context = context
+
+    def decrypt(self, data, output=None):
+        result = self._context.update(data)
+        if output is None:
+            return result
+        output[:len(result)] = result
+        return None
+
+    encrypt = decrypt
 
-def derive_key(password, salt, iterations=100000):
+
+class _CryptographyBackend:
+    """cryptography（OpenSSL，可使用 AES-NI）的 AES-CBC 和 PBKDF2"""
+
+    name = 'cryptography'
+
+    def __init__(self):
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+        from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+        self._hashes = hashes
+        self._cipher, self._algorithms, self._modes = Cipher, algorithms, modes
+        self._pbkdf2 = PBKDF2HMAC
+
+    def _cbc(self, key, iv):
+        return self._cipher(self._algorithms.AES(bytes(key)), self._modes.CBC(bytes(iv)))
+
+    def cbc_decryptor(self, key, iv):
+        return _CryptographyCBC(self._cbc(key, iv).decryptor())
+
+    def cbc_encryptor(self, key, iv):
+        return _CryptographyCBC(self._cbc(key, iv).encryptor())
+
+    def pbkdf2_sha256(self, password, salt, iterations, dklen):
+        return self._pbkdf2(algorithm=self._hashes.SHA256(), length=dklen, salt=bytes(salt),
+                            iterations=iterations).derive(password)
+
+
+class _PureAES:
+    """纯 Python 的 AES 分组运算（查表实现），只在没有任何加密库时使用，速度很慢"""
+
+    _tables = None
+
+    @classmethod
+    def _build_tables(cls):
+        def xtime(a):
+            return ((a << 1) ^ 0x1B) & 0xFF if a & 0x80 else a << 1
+
+        def mul(a, b):
+            result = 0
+            while b:
+                if b & 1:
+                    result ^= a
+                a = xtime(a)
+                b >>= 1
+            return result
+
+        def ror(word, bits):
+            return ((word >> bits) | (word << (32 - bits))) & 0xFFFFFFFF
+
+        sbox = [0] * 256
+        inv_sbox = [0] * 256
+        for x in range(256):
+            # 求 GF(2^8) 中的乘法逆元，再做仿射变换
+            inverse = next((y for y in range(1, 256) if mul(x, y) == 1), 0) if x else 0
+            s = inverse
+            for shift in range(1, 5):
+                s ^= ((inverse << shift) | (inverse >> (8 - shift))) & 0xFF
+            s ^= 0x63
+            sbox[x] = s
+            inv_sbox[s] = x
+        te0 = [(mul(s, 2) << 24) | (s << 16) | (s << 8) | mul(s, 3) for s in sbox]
+        td0 = [(mul(s, 14) << 24) | (mul(s, 9) << 16) | (mul(s, 13) << 8) | mul(s, 11) for s in inv_sbox]
+        te = [te0] + [[ror(w, bits) for w in te0] for bits in (8, 16, 24)]
+        td = [td0] + [[ror(w, bits) for w in td0] for bits in (8, 16, 24)]
+        cls._tables = (sbox, inv_sbox, te, td)
+
+    def __init__(self, key):
+        if self._tables is None:
+            self._build_tables()
+        sbox, _, _, td = self._tables
+        nk = len(key) // 4
+        if len(key) not in (16, 24, 32):
+            raise ValueError("AES 密钥长度必须是 16、24 或 32 字节")
+        self.rounds = nk + 6
+        words = list(struct.unpack(f'>{nk}I', bytes(key)))
+        rcon = 1
+        for i in range(nk, 4 * (self.rounds + 1)):
+            t = words[i - 1]
+            if i % nk == 0:
+                t = ((sbox[(t >> 16) & 255] << 24) | (sbox[(t >> 8) & 255] << 16) | (sbox[t & 255] << 8)
+                     | sbox[t >> 24]) ^ (rcon << 24)
+                rcon = ((rcon << 1) ^ 0x1B) & 0xFF if rcon & 0x80 else rcon << 1
+            elif nk > 6 and i % nk == 4:
+                t = (sbox[t >> 24] << 24) | (sbox[(t >> 16) & 255] << 16) | (sbox[(t >> 8) & 255] << 8) | sbox[t & 255]
+            words.append(words[i - nk] ^ t)
+        self._ek = words
+        # 等价逆密码的轮密钥：倒序，中间各轮做 InvMixColumns
+        dk = []
+        for r in range(self.rounds, -1, -1):
+            round_key = words[4 * r:4 * r + 4]
+            if 0 < r < self.rounds:
+                round_key = [td[0][sbox[w >> 24]] ^ td[1][sbox[(w >> 16) & 255]] ^ td[2][sbox[(w >> 8) & 255]]
+                             ^ td[3][sbox[w & 255]] for w in round_key]
+            dk.extend(round_key)
+        self._dk = dk
+
+    def encrypt_block(self, s0, s1, s2, s3):
+        sbox, _, (te0, te1, te2, te3), _ = self._tables
+        k = self._ek
+        s0, s1, s2, s3 = s0 ^ k[0], s1 ^ k[1], s2 ^ k[2], s3 ^ k[3]
+        for r in range(1, self.rounds):
+            i = 4 * r
+            s0, s1, s2, s3 = (
+                te0[s0 >> 24] ^ te1[(s1 >> 16) & 255] ^ te2[(s2 >> 8) & 255] ^ te3[s3 & 255] ^ k[i],
+                te0[s1 >> 24] ^ te1[(s2 >> 16) & 255] ^ te2[(s3 >> 8) & 255] ^ te3[s0 & 255] ^ k[i + 1],
+                te0[s2 >> 24] ^ te1[(s3 >> 16) & 255] ^ te2[(s0 >> 8) & 255] ^ te3[s1 & 255] ^ k[i + 2],
+                te0[s3 >> 24] ^ te1[(s0 >> 16) & 255] ^ te2[(s1 >> 8) & 255] ^ te3[s2 & 255] ^ k[i + 3],
+            )
+        i = 4 * self.rounds
+        return (
+            ((sbox[s0 >> 24] << 24) | (sbox[(s1 >> 16) & 255] << 16) | (sbox[(s2 >> 8) & 255] << 8) | sbox[s3 & 255]) ^ k[i],
+            ((sbox[s1 >> 24] << 24) | (sbox[(s2 >> 16) & 255] << 16) | (sbox[(s3 >> 8) & 255] << 8) | sbox[s0 & 255]) ^ k[i + 1],
+            ((sbox[s2 >> 24] << 24) | (sbox[(s3 >> 16) & 255] << 16) | (sbox[(s0 >> 8) & 255] << 8) | sbox[s1 & 255]) ^ k[i + 2],
+            ((sbox[s3 >> 24] << 24) | (sbox[(s0 >> 16) & 255] << 16) | (sbox[(s1 >> 8) & 255] << 8) | sbox[s2 & 255]) ^ k[i + 3],
+        )
+
+    def decrypt_block(self, s0, s1, s2, s3):
+        _, inv, _, (td0, td1, td2, td3) = self._tables
+        k = self._dk
+        s0, s1, s2, s3 = s0 ^ k[0], s1 ^ k[1], s2 ^ k[2], s3 ^ k[3]
+        for r in range(1, self.rounds):
+            i = 4 * r
+            s0, s1, s2, s3 = (
+                td0[s0 >> 24] ^ td1[(s3 >> 16) & 255] ^ td2[(s2 >> 8) & 255] ^ td3[s1 & 255] ^ k[i],
+                td0[s1 >> 24] ^ td1[(s0 >> 16) & 255] ^ td2[(s3 >> 8) & 255] ^ td3[s2 & 255] ^ k[i + 1],
+                td0[s2 >> 24] ^ td1[(s1 >> 16) & 255] ^ td2[(s0 >> 8) & 255] ^ td3[s3 & 255] ^ k[i + 2],
+                td0[s3 >> 24] ^ td1[(s2 >> 16) & 255] ^ td2[(s1 >> 8) & 255] ^ td3[s0 & 255] ^ k[i + 3],
+            )
+        i = 4 * self.rounds
+        return (
+            ((inv[s0 >> 24] << 24) | (inv[(s3 >> 16) & 255] << 16) | (inv[(s2 >> 8) & 255] << 8) | inv[s1 & 255]) ^ k[i],
+            ((inv[s1 >> 24] << 24) | (inv[(s0 >> 16) & 255] << 16) | (inv[(s3 >> 8) & 255] << 8) | inv[s2 & 255]) ^ k[i + 1],
+            ((inv[s2 >> 24] << 24) | (inv[(s1 >> 16) & 255] << 16) | (inv[(s0 >> 8) & 255] << 8) | inv[s3 & 255]) ^ k[i + 2],
+            ((inv[s3 >> 24] << 24) | (inv[(s2 >> 16) & 255] << 16) | (inv[(s1 >> 8) & 255] << 8) | inv[s0 & 255]) ^ k[i + 3],
+        )
+
+
+class _PureCBC:
+    _BLOCK = struct.Struct('>4I')
+
+    def __init__(self, key, iv):
+        self._aes = _PureAES(key)
+        self._prev = self._BLOCK.unpack(bytes(iv))
+
+    def decrypt(self, data, output=None):
+        data = memoryview(data).cast('B')
+        out = bytearray(len(data)) if output is None else output
+        prev = self._prev
+        for offset in range(0, len(data), BLOCK_SIZE):
+            block = self._BLOCK.unpack_from(data, offset)
+            plain = self._aes.decrypt_block(*block)
+            self._BLOCK.pack_into(out, offset, plain[0] ^ prev[0], plain[1] ^ prev[1], plain[2] ^ prev[2],
+                                  plain[3] ^ prev[3])
+            prev = block
+        self._prev = prev
+        return bytes(out) if output is None else None
+
+    def encrypt(self, data, output=None):
+        data = memoryview(data).cast('B')
+        out = bytearray(len(data)) if output is None else output
+        prev = self._prev
+        for offset in range(0, len(data), BLOCK_SIZE):
+            block = self._BLOCK.unpack_from(data, offset)
+            prev = self._aes.encrypt_block(block[0] ^ prev[0], block[1] ^ prev[1], block[2] ^ prev[2],
+                                           block[3] ^ prev[3])
+            self._BLOCK.pack_into(out, offset, *prev)
+        self._prev = prev
+        return bytes(out) if output is None else None
+
+
+class _PureBackend:
+    """不依赖任何第三方库的后备实现：纯 Python AES-CBC，PBKDF2 使用标准库 hashlib"""
+
+    name = 'pure'
+
+    def cbc_decryptor(self, key, iv):
+        return _PureCBC(key, iv)
+
+    def cbc_encryptor(self, key, iv):
+        return _PureCBC(key, iv)
+
+    def pbkdf2_sha256(self, password, salt, iterations, dklen):
+        return hashlib.pbkdf2_hmac('sha256', password, salt, iterations, dklen=dklen)
+
+
+BACKENDS = {
+    'pycryptodome': _PycryptodomeBackend,
+    'cryptography': _CryptographyBackend,
+    'pure': _PureBackend,
+}
+_backend = None
+_backend_info = {'name': None, 'selected_by': None, 'benchmark': None}
+_backend_lock = threading.Lock()
+
+def available_backends():
+    """返回当前环境中可用的后端名称（pure 总是可用）"""
+    names = []
+    for name, backend_class in BACKENDS.items():
+        try:
+            backend_class()
+        except ImportError:
+            continue
+        names.append(name)
+    return names
+
+def benchmark_backends(names=None, size=256 * 1024, rounds=3):
+    """对各后端做 AES-CBC 解密的微基准测试，返回 {后端名称: MB/s}；纯 Python 实现只用 4KB 测量"""
+    results = {}
+    key = os.urandom(32)
+    iv = os.urandom(IV_SIZE)
+    for name in names or available_backends():
+        try:
+            backend = BACKENDS[name]()
+        except ImportError:
+            continue
+        data = bytes(4096 if name == 'pure' else size)
+        out = bytearray(len(data))
+        best = float('inf')
+        for _ in range(rounds):
+            start = time.perf_counter()
+            backend.cbc_decryptor(key, iv).decrypt(data, output=out)
+            best = min(best, time.perf_counter() - start)
+        results[name] = len(data) / max(best, 1e-9) / 1024 / 1024
+    return results
+
+def set_backend(name='auto'):
+    """
+    选择加密后端: 'pycryptodome' / 'cryptography' / 'pure'，或 'auto'（对可用的后端做微基准测试，
+    选择最快的；有任一加密库时不考虑纯 Python 实现）。指定的后端不可用时抛出 ValueError。返回后端名称。
+    """
+    global _backend
+    with _backend_lock:
+        if name in (None, '', 'auto'):
+            native = [n for n in available_backends() if n != 'pure']
+            results = benchmark_backends(native or ['pure'])
+            chosen = max(results, key=results.get)
+            _backend = BACKENDS[chosen]()
+            _backend_info.update(name=chosen, selected_by='auto', benchmark=results)
+            return chosen
+        if name not in BACKENDS:
+            raise ValueError(f"未知的加密后端: {name}（可选: auto, {', '.join(BACKENDS)}）")
+        try:
+            _backend = BACKENDS[name]()
+        except ImportError as e:
+            raise ValueError(f"加密后端 {name} 不可用: {str(e)}")
+        _backend_info.update(name=name, selected_by='explicit', benchmark=None)
+        return name
+
+def get_backend():
+    """返回当前加密后端；首次调用时按环境变量 BAIDU_DECRYPT_BACKEND 选择，未设置时自动选择最快的"""
+    if _backend is None:
+        name = os.environ.get(BACKEND_ENV, 'auto')
+        set_backend(name)
+        if name not in (None, '', 'auto'):
+            _backend_info['selected_by'] = 'env'
+    return _backend
+
+def backend_info():
+    """返回当前后端的名称、选择方式（auto / env / explicit）和自动选择时的基准测试结果；尚未选择时名称为 None"""
+    return dict(_backend_info)
+
+def _cbc_decryptor(key, iv):
+    return get_backend().cbc_decryptor(key, iv)
+
+def _cbc_encryptor(key, iv):
+    return get_backend().cbc_encryptor(key, iv)
+
+# --- Key Derivation ---
+
+def derive_key(password, salt, iterations=KDF_ITERATIONS):
     """从密码派生密钥"""
-    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations, dklen=32)
-
-def decrypt_data(encrypted_data, password="123456"):
-    """解密数据"""
-    salt = encrypted_data[:16]
-    iv = encrypted_data[16:32]
-    actual_encrypted_data = encrypted_data[32:]
-    key = derive_key(password, salt)
-    cipher = AES.new(key, AES.MODE_CBC, iv)
-    decrypted_padded_data = cipher.decrypt(actual_encrypted_data)
-    decrypted_data = unpad(decrypted_padded_data, AES.block_size)
+    return get_backend().pbkdf2_sha256(password.encode(), salt, iterations, 32)
+
+# --- Derived-Key Cache ---
+
+class KeyStore:
+    """
+    持久化的派生密钥库 (SQLite)，跨进程、跨运行复用派生结果。
+
+    密钥库中的记录在静态存储时受保护：索引是以库密钥计算的 HMAC，不暴露密码和 salt；
+    派生密钥本身用库密钥做 AES-GCM 加密。库密钥依次取自 secret 参数、环境变量
+    BAIDU_DECRYPT_KEYSTORE_SECRET，或与数据库同目录的 "<path>.key" 文件（不存在时自动
+    生成，权限为 0600）。单独拷走数据库文件无法还原任何密钥。
+    """
+
+    def __init__(self, path, secret=None):
+        self.path = path
+        self._secret = self._load_secret(path, secret)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS keys (id BLOB PRIMARY KEY, sealed BLOB NOT NULL)")
+            self._conn.commit()
+
+    @staticmethod
+    def _load_secret(path, secret):
+        if secret is None:
+            secret = os.environ.get(KEYSTORE_SECRET_ENV)
+        if secret is not None:
+            if isinstance(secret, str):
+                secret = secret.encode()
+            return hashlib.sha256(secret).digest()
+
+        key_path = f"{path}.key"
+        try:
+            fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            with open(key_path, 'rb') as f:
+                return hashlib.sha256(f.read()).digest()
+        with os.fdopen(fd, 'wb') as f:
+            raw = os.urandom(32)
+            f.write(raw)
+        return hashlib.sha256(raw).digest()
+
+    def _entry_id(self, password, salt, iterations):
+        message = b"%d\0%s\0%s" % (iterations, bytes(salt), password.encode())
+        return hmac.new(self._secret, message, hashlib.sha256).digest()
+
+    def get(self, password, salt, iterations):
+        """查找派生密钥，不存在或无法验证时返回 None"""
+        entry_id = self._entry_id(password, salt, iterations)
+        with self._lock:
+            row = self._conn.execute("SELECT sealed FROM keys WHERE id = ?", (entry_id,)).fetchone()
+        if row is None:
+            return None
+        sealed = row[0]
+        try:
+            cipher = AES.new(self._secret, AES.MODE_GCM, nonce=sealed[:12])
+            cipher.update(entry_id)
+            return cipher.decrypt_and_verify(sealed[28:], sealed[12:28])
+        except ValueError:
+            return None
+
+    def put(self, password, salt, iterations, key):
+        """保存派生密钥"""
+        entry_id = self._entry_id(password, salt, iterations)
+        nonce = os.urandom(12)
+        cipher = AES.new(self._secret, AES.MODE_GCM, nonce=nonce)
+        cipher.update(entry_id)
+        ciphertext, tag = cipher.encrypt_and_digest(key)
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO keys (id, sealed) VALUES (?, ?)",
+                               (entry_id, nonce + tag + ciphertext))
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class KeyCache:
+    """
+    线程安全的派生密钥 LRU 缓存，键为 (password, salt, iterations)。
+
+    重复处理同一个文件（失败重试、校验、重新导出）时可直接复用派生结果，跳过
+    100,000 次迭代的 PBKDF2。可选挂载一个 KeyStore 作为二级持久缓存。
+    """
+
+    def __init__(self, maxsize=4096, keystore=None):
+        self.maxsize = maxsize
+        self.keystore = keystore
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.keystore_hits = 0
+        self.misses = 0
+
+    def get_key(self, password, salt, iterations=KDF_ITERATIONS, stats=NO_STATS):
+        """返回派生密钥：依次查找内存缓存、持久密钥库，都未命中时才运行 PBKDF2"""
+        cache_key = (password, bytes(salt), iterations)
+        with self._lock:
+            key = self._entries.get(cache_key)
+            if key is not None:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return key
+
+        key = None
+        if self.keystore:
+            with stats.stage('keystore'):
+                key = self.keystore.get(password, salt, iterations)
+        if key is not None:
+            with self._lock:
+                self.keystore_hits += 1
+        else:
+            with stats.stage('kdf'):
+                key = derive_key(password, salt, iterations)
+            with self._lock:
+                self.misses += 1
+            if self.keystore:
+                self.keystore.put(password, salt, iterations, key)
+
+        self._remember(cache_key, key)
+        return key
+
+    def _remember(self, cache_key, key):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[cache_key] = key
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        """返回命中统计"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'keystore_hits': self.keystore_hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+
+    def clear(self):
+        """清空内存缓存并重置计数器（不影响持久密钥库）"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.keystore_hits = self.misses = 0
+
+
+_key_cache = KeyCache()
+
+def get_key_cache():
+    """返回进程内共享的派生密钥缓存"""
+    return _key_cache
+
+def configure_key_cache(maxsize=None, keystore_path=None, keystore_secret=None):
+    """调整共享缓存的容量，或挂载持久密钥库 (keystore_path)"""
+    if maxsize is not None:
+        _key_cache.maxsize = maxsize
+    if keystore_path:
+        if _key_cache.keystore:
+            _key_cache.keystore.close()
+        _key_cache.keystore = KeyStore(keystore_path, keystore_secret)
+    return _key_cache
+
+def get_key(password, salt, iterations=KDF_ITERATIONS, stats=NO_STATS):
+    """通过共享缓存获取派生密钥"""
+    return _key_cache.get_key(password, salt, iterations, stats)
+
+# --- Core Decryption Functions (Silent, for Library Use) ---
+
+def decrypt_data(encrypted_data, password="123456", workers=1):
+    """
+    解密数据
+
+    encrypted_data 可以是任何支持缓冲区协议的对象（bytes、bytearray、memoryview、mmap 等）。
+    切片通过 memoryview 完成，不复制密文；明文直接解密到一个 bytearray 中并原地截去填充后返回。
+    workers > 1（None 或 0 表示全部 CPU 核心）且数据不小于 PARALLEL_MIN_SIZE 时按段多核并行解密。
+    """
+    view = memoryview(encrypted_data).cast('B')
+    if len(view) < HEADER_SIZE + BLOCK_SIZE or (len(view) - HEADER_SIZE) % BLOCK_SIZE:
+        raise ValueError("密文长度不是分组长度的整数倍")
+    salt = view[:SALT_SIZE]
+    iv = view[SALT_SIZE:HEADER_SIZE]
+    actual_encrypted_data = view[HEADER_SIZE:]
+    key = get_key(password, salt)
+    decrypted_data = bytearray(len(actual_encrypted_data))
+    workers = resolve_workers(workers)
+    if workers > 1 and len(view) >= PARALLEL_MIN_SIZE:
+        out = memoryview(decrypted_data)
+
+        def decrypt_segment(start, end, segment_iv):
+            _cbc_decryptor(key, segment_iv).decrypt(view[start:end],
+                                                           output=out[start - HEADER_SIZE:end - HEADER_SIZE])
+
+        _run_segments(view, workers, SEGMENT_SIZE, decrypt_segment)
+        out[-BLOCK_SIZE:] = _cbc_decryptor(key, view[-2 * BLOCK_SIZE:-BLOCK_SIZE]).decrypt(view[-BLOCK_SIZE:])
+        out.release()
+    else:
+        cipher = _cbc_decryptor(key, iv)
+        cipher.decrypt(actual_encrypted_data, output=decrypted_data)
+    if not _has_valid_padding(decrypted_data[-BLOCK_SIZE:]):
+        raise ValueError("Padding is incorrect.")
+    del decrypted_data[-decrypted_data[-1]:]
     return decrypted_data
 
-def is_encrypted_file(file_path):
-    """简单检查文件是否可能是我们的加密文件"""
+def decrypt_buffer(encrypted_data, dst, password="123456", chunk_size=CHUNK_SIZE, stats=NO_STATS):
+    """
+    将内存中的密文（任何缓冲区对象，通常是 mmap）分块解密写入 dst，返回写入的明文字节数。
+
+    直接从缓冲区（对 mmap 而言即页缓存）读取密文，明文写入一个可复用的输出缓冲区，
+    整个过程没有中间拷贝，内存占用只有一个 chunk_size。
+    """
+    if chunk_size <= 0 or chunk_size % BLOCK_SIZE:
+        raise ValueError(f"chunk_size 必须是 {BLOCK_SIZE} 的正整数倍")
+    view = memoryview(encrypted_data).cast('B')
+    payload_size = len(view) - HEADER_SIZE
+    if payload_size < BLOCK_SIZE or payload_size % BLOCK_SIZE:
+        raise ValueError("密文长度不是分组长度的整数倍")
+
+    key = get_key(password, view[:SALT_SIZE], stats=stats)
+    cipher = _cbc_decryptor(key, view[SALT_SIZE:HEADER_SIZE])
+    out = memoryview(bytearray(min(chunk_size, payload_size)))
+    written = 0
+    # 最后一个分组单独处理以去除填充
+    end = len(view) - BLOCK_SIZE
+    offset = HEADER_SIZE
+    while offset < end:
+        n = min(chunk_size, end - offset)
+        start = time.perf_counter()
+        cipher.decrypt(view[offset:offset + n], output=out[:n])
+        decrypted = time.perf_counter()
+        written += dst.write(out[:n])
+        stats.record('aes', decrypted - start, n)
+        stats.record('write', time.perf_counter() - decrypted, n)
+        offset += n
+
+    last_block = cipher.decrypt(view[end:])
+    if not _has_valid_padding(last_block):
+        raise ValueError("Padding is incorrect.")
+    written += dst.write(last_block[:BLOCK_SIZE - last_block[-1]])
+    return written
+
+def decrypt_stream(src, dst, password="123456", chunk_size=CHUNK_SIZE, stats=NO_STATS):
+    """
+    流式解密：从可读的二进制文件对象 src 读取密文，将明文写入 dst。
+
+    每次只解密 chunk_size 字节并立即写出，只保留最后一个分组用于去除 PKCS7 填充，
+    因此内存占用与文件大小无关。返回写入的明文字节数；密码错误或数据损坏时抛出 ValueError。
+    """
+    if chunk_size <= 0 or chunk_size % BLOCK_SIZE:
+        raise ValueError(f"chunk_size 必须是 {BLOCK_SIZE} 的正整数倍")
+
+    header = src.read(HEADER_SIZE)
+    while len(header) < HEADER_SIZE:
+        more = src.read(HEADER_SIZE - len(header))
+        if not more:
+            raise ValueError("文件头不完整")
+        header += more
+
+    key = get_key(password, header[:SALT_SIZE], stats=stats)
+    cipher = _cbc_decryptor(key, header[SALT_SIZE:])
+
+    # 缓冲区末尾多留一个分组，用来存放上一轮保留下来的尾部数据
+    buf = bytearray(chunk_size + BLOCK_SIZE)
+    view = memoryview(buf)
+    held = 0
+    written = 0
+    while True:
+        start = time.perf_counter()
+        n = src.readinto(view[held:])
+        stats.record('read', time.perf_counter() - start, n or 0)
+        if not n:
+            break
+        total = held + n
+        # 保留最后一个完整分组（或不完整的尾部），其余按分组对齐后立即解密写出
+        cut = ((total - 1) // BLOCK_SIZE) * BLOCK_SIZE
+        if cut:
+            start = time.perf_counter()
+            plaintext = cipher.decrypt(view[:cut])
+            decrypted = time.perf_counter()
+            written += dst.write(plaintext)
+            stats.record('aes', decrypted - start, cut)
+            stats.record('write', time.perf_counter() - decrypted, cut)
+            view[:total - cut] = view[cut:total]
+        held = total - cut
+
+    if held != BLOCK_SIZE:
+        raise ValueError("密文长度不是分组长度的整数倍")
+    last_block = cipher.decrypt(view[:BLOCK_SIZE])
+    if not _has_valid_padding(last_block):
+        raise ValueError("Padding is incorrect.")
+    written += dst.write(last_block[:BLOCK_SIZE - last_block[-1]])
+    return written
+
+def _run_segments(view, workers, segment_size, decrypt_segment):
+    """
+    把 view（文件头 + 密文）中除最后一个分组外的密文按 segment_size 切分成若干段，在 workers 个线程中
+    调用 decrypt_segment(start, end, iv) 并行解密。CBC 中每个分组只依赖自身密文和前一个密文分组，
+    因此每段以它前面的 16 字节（第一段即文件头中的 IV）作为 IV 即可独立解密。
+    """
+    if segment_size <= 0 or segment_size % BLOCK_SIZE:
+        raise ValueError(f"segment_size 必须是 {BLOCK_SIZE} 的正整数倍")
+    end = len(view) - BLOCK_SIZE
+    bounds = [(start, min(start + segment_size, end)) for start in range(HEADER_SIZE, end, segment_size)]
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(bounds)))) as executor:
+        futures = [executor.submit(decrypt_segment, start, stop, view[start - BLOCK_SIZE:start])
+                   for start, stop in bounds]
+        for future in as_completed(futures):
+            future.result()
+
+def _decrypt_last_block(key, view):
+    """单独解密最后一个分组并检查填充，返回去除填充后的明文"""
+    last_block = _cbc_decryptor(key, view[-2 * BLOCK_SIZE:-BLOCK_SIZE]).decrypt(view[-BLOCK_SIZE:])
+    if not _has_valid_padding(last_block):
+        raise ValueError("Padding is incorrect.")
+    return last_block[:BLOCK_SIZE - last_block[-1]]
+
+def _pwrite_all(fd, data, offset, lock=None):
+    """在指定偏移处写出全部数据；没有 os.pwrite 的平台（Windows）上持锁 lseek + write"""
+    view = memoryview(data)
+    if lock is not None:
+        with lock:
+            os.lseek(fd, offset, os.SEEK_SET)
+            while view:
+                view = view[os.write(fd, view):]
+        return
+    while view:
+        n = os.pwrite(fd, view, offset)
+        view = view[n:]
+        offset += n
+
+def decrypt_parallel(encrypted_data, dst, password="123456", workers=None, segment_size=SEGMENT_SIZE,
+                     chunk_size=CHUNK_SIZE, stats=NO_STATS):
+    """
+    多核并行解密单个大文件，返回写入的明文字节数。
+
+    encrypted_data 为整个加密文件的缓冲区（通常是 mmap），dst 为刚创建的输出文件对象。先解密最后一个分组
+    确定明文长度并预分配输出文件，再把密文切分成按分组对齐的段，各段在线程池中以 chunk_size 为单位解密，
+    用 pwrite 写到输出文件中对应的偏移处；只有最后一个分组需要去除填充。workers 为 None 或 0 时使用全部 CPU 核心。
+    """
+    if chunk_size <= 0 or chunk_size % BLOCK_SIZE:
+        raise ValueError(f"chunk_size 必须是 {BLOCK_SIZE} 的正整数倍")
+    view = memoryview(encrypted_data).cast('B')
+    payload_size = len(view) - HEADER_SIZE
+    if payload_size < BLOCK_SIZE or payload_size % BLOCK_SIZE:
+        raise ValueError("密文长度不是分组长度的整数倍")
+
+    key = get_key(password, view[:SALT_SIZE], stats=stats)
+    tail = _decrypt_last_block(key, view)
+    plain_size = payload_size - BLOCK_SIZE + len(tail)
+
+    dst.flush()
+    fd = dst.fileno()
+    if hasattr(os, 'posix_fallocate') and plain_size:
+        try:
+            os.posix_fallocate(fd, 0, plain_size)
+        except OSError:
+            pass
+    os.ftruncate(fd, plain_size)
+    lock = None if hasattr(os, 'pwrite') else threading.Lock()
+
+    def decrypt_segment(start, end, iv):
+        cipher = _cbc_decryptor(key, iv)
+        out = memoryview(bytearray(min(chunk_size, end - start)))
+        for offset in range(start, end, chunk_size):
+            n = min(chunk_size, end - offset)
+            began = time.perf_counter()
+            cipher.decrypt(view[offset:offset + n], output=out[:n])
+            decrypted = time.perf_counter()
+            _pwrite_all(fd, out[:n], offset - HEADER_SIZE, lock)
+            stats.record('aes', decrypted - began, n)
+            stats.record('write', time.perf_counter() - decrypted, n)
+
+    _run_segments(view, resolve_workers(workers), segment_size, decrypt_segment)
+    _pwrite_all(fd, tail, payload_size - BLOCK_SIZE, lock)
+    return plain_size
+
+def decrypt_pipelined(src, dst, password="123456", chunk_size=CHUNK_SIZE, stats=NO_STATS, depth=PIPELINE_DEPTH):
+    """
+    流水线解密：读取、解密、写出三个阶段在不同线程中并发执行，返回写入的明文字节数。
+
+    读取线程和写出线程分别在 depth 个可复用的输入 / 输出缓冲区上循环，文件 I/O 和 AES 都会释放 GIL，
+    因此大文件的吞吐量接近 min(磁盘, AES) 而不是两者串行之和。内存占用为 2 * depth * chunk_size。
+    密码错误或数据损坏时抛出 ValueError，与 decrypt_stream 一致。
+    """
+    if chunk_size <= 0 or chunk_size % BLOCK_SIZE:
+        raise ValueError(f"chunk_size 必须是 {BLOCK_SIZE} 的正整数倍")
+    depth = max(2, depth)
+
+    header = src.read(HEADER_SIZE)
+    while len(header) < HEADER_SIZE:
+        more = src.read(HEADER_SIZE - len(header))
+        if not more:
+            raise ValueError("文件头不完整")
+        header += more
+
+    key = get_key(password, header[:SALT_SIZE], stats=stats)
+    cipher = _cbc_decryptor(key, header[SALT_SIZE:])
+
+    free_in = queue.Queue()
+    free_out = queue.Queue()
+    for _ in range(depth):
+        free_in.put(memoryview(bytearray(chunk_size)))
+        free_out.put(memoryview(bytearray(chunk_size)))
+    filled = queue.Queue()
+    to_write = queue.Queue()
+    writer_error = []
+    written = [0]
+
+    def reader():
+        # 每次读满一个 chunk_size（文件末尾除外），保证除最后一块外都按分组对齐
+        try:
+            while True:
+                buf = free_in.get()
+                if buf is None:
+                    return
+                n = 0
+                start = time.perf_counter()
+                while n < chunk_size:
+                    got = src.readinto(buf[n:])
+                    if not got:
+                        break
+                    n += got
+                stats.record('read', time.perf_counter() - start, n)
+                filled.put((buf, n))
+                if n < chunk_size:
+                    return
+        except BaseException as e:
+            filled.put((None, e))
+
+    def writer():
+        # 出错后继续取出并归还缓冲区，避免解密阶段阻塞
+        while True:
+            item = to_write.get()
+            if item is None:
+                return
+            buf, n = item
+            if not writer_error:
+                try:
+                    start = time.perf_counter()
+                    written[0] += dst.write(buf[:n])
+                    stats.record('write', time.perf_counter() - start, n)
+                except BaseException as e:
+                    writer_error.append(e)
+            free_out.put(buf)
+
+    reader_thread = threading.Thread(target=reader, name="decrypt-reader", daemon=True)
+    writer_thread = threading.Thread(target=writer, name="decrypt-writer", daemon=True)
+    reader_thread.start()
+    writer_thread.start()
+    try:
+        # 解密结果晚一块交给写出线程：最后一块要先去除填充
+        pending = None
+        while True:
+            buf, n = filled.get()
+            if buf is None:
+                raise n
+            if n % BLOCK_SIZE:
+                raise ValueError("密文长度不是分组长度的整数倍")
+            if n:
+                out = free_out.get()
+                if writer_error:
+                    raise writer_error[0]
+                start = time.perf_counter()
+                cipher.decrypt(buf[:n], output=out[:n])
+                stats.record('aes', time.perf_counter() - start, n)
+                free_in.put(buf)
+                if pending:
+                    to_write.put(pending)
+                pending = (out, n)
+            if n < chunk_size:
+                break
+
+        if pending is None:
+            raise ValueError("密文长度不是分组长度的整数倍")
+        out, n = pending
+        last_block = out[n - BLOCK_SIZE:n]
+        if not _has_valid_padding(last_block):
+            raise ValueError("Padding is incorrect.")
+        to_write.put((out, n - last_block[-1]))
+    finally:
+        free_in.put(None)
+        to_write.put(None)
+        writer_thread.join()
+        reader_thread.join()
+    if writer_error:
+        raise writer_error[0]
+    return written[0]
+
+def decrypt_pipe(src, dst, password="123456", passwords=None, chunk_size=CHUNK_SIZE, stats=NO_STATS):
+    """
+    在两个二进制流之间解密（如标准输入 / 标准输出），返回写入的明文字节数。
+
+    使用流水线解密，内存占用固定，最后一个分组去除填充后写出，适合作为 shell 管道中的一环。
+    src 可随机访问时（普通文件或重定向的文件）先只解密最后一个分组检查密码，passwords 中的候选密码
+    自动选择；src 为管道时无法预检，只能使用一个密码，密码错误要到最后一个分组才能发现（抛出 ValueError），
+    此前已写出的数据无效。
+    """
+    selector = PasswordSelector(passwords if passwords else [password])
+    try:
+        seekable = src.seekable()
+    except (AttributeError, ValueError):
+        seekable = False
+    if seekable:
+        file_size = src.seek(0, os.SEEK_END)
+        password, reason = selector.select_open(src, file_size, stats)
+        if password is None:
+            raise ValueError(f"解密失败，{reason}。")
+        src.seek(0)
+    elif len(selector.passwords) > 1:
+        raise ValueError("从管道读取时无法预检密码，只能指定一个密码")
+    else:
+        password = selector.passwords[0]
+    written = decrypt_pipelined(src, dst, password, chunk_size, stats)
+    dst.flush()
+    return written
+
+def _has_valid_padding(last_block):
+    """检查解密后的最后一个分组是否带有合法的 PKCS7 填充"""
+    pad_len = last_block[-1]
+    if not 1 <= pad_len <= BLOCK_SIZE:
+        return False
+    return last_block[-pad_len:] == bytes([pad_len]) * pad_len
+
+def _check_password(f, file_size, password, stats=NO_STATS):
+    """在已打开的文件上检查密码：只读取文件头和最后两个密文分组，返回 (是否通过, 原因)"""
+    payload_size = file_size - HEADER_SIZE
+    if payload_size < BLOCK_SIZE:
+        return False, "文件过小，缺少文件头或密文"
+    if payload_size % BLOCK_SIZE:
+        return False, f"密文长度不是{BLOCK_SIZE}的整数倍"
+
+    with stats.stage('read', HEADER_SIZE + 2 * BLOCK_SIZE):
+        f.seek(0)
+        header = f.read(HEADER_SIZE)
+        if payload_size == BLOCK_SIZE:
+            # 只有一个分组时，它的"前一个密文分组"就是 IV
+            prev_block = header[SALT_SIZE:]
+        else:
+            f.seek(file_size - 2 * BLOCK_SIZE)
+            prev_block = f.read(BLOCK_SIZE)
+        f.seek(file_size - BLOCK_SIZE)
+        last_block = f.read(BLOCK_SIZE)
+    if len(header) != HEADER_SIZE or len(prev_block) != BLOCK_SIZE or len(last_block) != BLOCK_SIZE:
+        return False, "文件在读取过程中被截断"
+
+    key = get_key(password, header[:SALT_SIZE], stats=stats)
+    if not _has_valid_padding(_cbc_decryptor(key, prev_block).decrypt(last_block)):
+        return False, "填充无效，密码错误或文件已损坏"
+    return True, "通过"
+
+def verify_password(file_path, password="123456"):
+    """
+    快速检查密码是否正确，不解密整个文件。
+
+    CBC 模式下最后一个分组只依赖它自己和前一个密文分组，因此只需解密最后一个分组并检查
+    PKCS7 填充即可，耗时基本只有密钥派生。返回 True 表示填充有效（密码很可能正确）。
+    文件格式没有完整性校验，密码错误时约有 1/256 的概率误判为有效；完整解密检查的也是同一个分组，
+    因此这种误判不会被发现，只会得到错误的明文。
+    """
+    return audit_file(file_path, password)[0]
+
+def audit_file(file_path, password="123456", passwords=None):
+    """
+    校验单个加密文件（文件头、密文长度对齐、最后一个分组的填充），不写出任何明文，返回 (是否通过, 原因)。
+    passwords 为候选密码列表时，任一候选密码通过即视为通过，原因中注明匹配的密码编号。
+    """
+    outcome, reason, _ = _audit_file(file_path, PasswordSelector(passwords if passwords else [password]))
+    return outcome == 'passed', reason
+
+def _audit_file(file_path, selector, classifier=None, file_size=None):
+    """
+    audit_file 的实现，返回 (结果类型, 原因, 匹配的密码)，结果类型为 'passed' / 'failed' / 'skipped'。
+
+    指定 classifier 时（目录校验），扩展名不符合的文件，以及填充检查未通过且文件头是常见明文格式的
+    文件视为普通文件，结果为 'skipped'；文件名表示加密文件（见 FileClassifier.claims_encrypted）但大小
+    不符合加密格式的文件是截断或损坏的密文，结果为 'failed'。
+    """
     try:
-        if os.path.getsize(file_path) < 48:
+        with open(file_path, 'rb') as f:
+            if file_size is None:
+                file_size = os.fstat(f.fileno()).st_size
+            if classifier is not None and not classifier.may_be_encrypted(file_path, file_size):
+                if not classifier.claims_encrypted(file_path):
+                    return 'skipped', "不是加密文件", None
+                # 大小检查在密钥派生之前完成，这里只用它给出长度不符的具体原因
+                return 'failed', _check_password(f, file_size, selector.passwords[0])[1], None
+            if len(selector.passwords) == 1:
+                password = selector.passwords[0]
+                ok, reason = _check_password(f, file_size, password)
+            else:
+                password, reason = selector.select_open(f, file_size)
+                ok = password is not None
+                if ok:
+                    reason = f"通过 (密码 {selector.label(password)})"
+            if not ok and classifier is not None:
+                f.seek(0)
+                if classifier.header_is_plain(f.read(HEADER_SIZE)):
+                    return 'skipped', "不是加密文件", None
+    except OSError as e:
+        return 'failed', f"读取失败: {str(e)}", None
+    return ('passed', reason, password) if ok else ('failed', reason, None)
+
+class PasswordSelector:
+    """
+    在多个候选密码中为每个文件自动选择匹配的密码。
+
+    候选密码通过只解密最后一个分组的填充检查确认。错误密码约有 1/256 的概率也能通过填充检查，而完整
+    解密检查的是同一个分组，无法发现这种误判；因此有多个候选密码时每个文件都检查全部候选，只有恰好
+    一个通过时才采用。多个候选同时通过的文件无法确定密码，按失败处理（不解密，也不删除原始文件）。
+    """
+
+    def __init__(self, passwords):
+        self.passwords = list(dict.fromkeys(passwords))
+        if not self.passwords:
+            raise ValueError("至少需要一个候选密码")
+
+    def matches_open(self, f, file_size, stats=NO_STATS):
+        """在已打开的文件上检查全部候选密码，返回所有通过填充检查的密码"""
+        return [password for password in self.passwords if _check_password(f, file_size, password, stats)[0]]
+
+    def select(self, file_path):
+        """返回唯一通过填充检查的候选密码，没有匹配或无法确定时返回 None"""
+        try:
+            with open(file_path, 'rb') as f:
+                return self.select_open(f, os.fstat(f.fileno()).st_size)[0]
+        except OSError:
+            return None
+
+    def select_open(self, f, file_size, stats=NO_STATS):
+        """
+        同 select，但在调用方已经打开的文件上检查，不再额外打开文件。
+        返回 (匹配的密码, 原因)，没有候选通过或多个候选同时通过时密码为 None。
+        """
+        matches = self.matches_open(f, file_size, stats)
+        if len(matches) == 1:
+            return matches[0], "通过"
+        if not matches:
+            return None, "密码可能不正确或文件已损坏"
+        labels = ", ".join(self.label(password) for password in matches)
+        return None, f"多个候选密码 ({labels}) 都通过了填充检查，无法确定正确的密码"
+
+    def label(self, password):
+        """返回密码在候选列表中的编号（从1开始），用于报告而不暴露密码本身"""
+        return f"#{self.passwords.index(password) + 1}"
+
+def load_password_file(path):
+    """从文本文件读取候选密码，每行一个，忽略空行"""
+    # utf-8-sig: 去掉 Windows 记事本保存时写入的 BOM，否则它会成为第一个密码的一部分
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        return [line.rstrip('\r\n') for line in f if line.strip()]
+
+class FileClassifier:
+    """
+    判断文件是否可能是加密文件，尽量不产生额外的 stat/open。
+
+    - 大小规则：文件至少包含文件头和一个分组，且密文长度是分组长度的整数倍（只需要文件大小）；
+    - 扩展名规则（可选）：plain_suffixes 中的扩展名总是视为普通文件；指定 encrypted_suffixes
+      时，只有这些扩展名的文件才会被视为加密文件；
+    - 魔数规则（可选，默认开启）：文件头是常见明文格式（PDF、ZIP、PNG 等）时视为普通文件，
+      检查使用解密时已经读取的文件头，不额外打开文件。加密文件的开头是随机的 salt，较短的魔数
+      （如 MZ、BZh）约有数万分之一的概率与之相同，因此目录处理中魔数只在密码预检未通过时用来区分
+      "普通文件" 和 "解密失败"，不会跳过能用密码解密的文件。
+    """
+
+    PLAIN_MAGICS = (
+        b'%PDF', b'PK\x03\x04', b'\x89PNG', b'\xff\xd8\xff', b'GIF8', b'Rar!', b'7z\xbc\xaf',
+        b'\x1f\x8b', b'BZh', b'\xfd7zXZ', b'ID3', b'RIFF', b'OggS', b'fLaC', b'\x1aE\xdf\xa3',
+        b'\xd0\xcf\x11\xe0', b'\x7fELF', b'MZ', b'SQLite format 3',
+    )
+
+    def __init__(self, encrypted_suffixes=None, plain_suffixes=None, detect_magic=True):
+        self.encrypted_suffixes = tuple(x.lower() for x in encrypted_suffixes) if encrypted_suffixes else None
+        self.plain_suffixes = tuple(x.lower() for x in plain_suffixes) if plain_suffixes else ()
+        self.detect_magic = detect_magic
+
+    def claims_encrypted(self, file_path):
+        """
+        文件名是否明确表示加密文件：匹配 encrypted_suffixes，未指定时以 .enc 结尾。
+        这样的文件大小不符合加密格式时是损坏（截断）的密文，应报告为失败而不是当作普通文件。
+        """
+        name = os.path.basename(file_path).lower()
+        if self.plain_suffixes and name.endswith(self.plain_suffixes):
             return False
+        return name.endswith(self.encrypted_suffixes or ('.enc',))
+
+    def may_be_encrypted(self, file_path, file_size):
+        """只根据文件名和大小判断，不访问文件"""
+        name = os.path.basename(file_path).lower()
+        if self.plain_suffixes and name.endswith(self.plain_suffixes):
+            return False
+        if self.encrypted_suffixes is not None and not name.endswith(self.encrypted_suffixes):
+            return False
+        payload_size = file_size - HEADER_SIZE
+        return payload_size >= BLOCK_SIZE and payload_size % BLOCK_SIZE == 0
+
+    def header_is_plain(self, header):
+        """根据已读取的文件头判断是否为常见的明文格式"""
+        if not self.detect_magic:
+            return False
+        # MP4/MOV 等 ISO 媒体文件的魔数位于偏移 4
+        return header.startswith(self.PLAIN_MAGICS) or header[4:8] == b'ftyp'
+
+DEFAULT_CLASSIFIER = FileClassifier()
+
+def is_encrypted_file(file_path, classifier=None):
+    """
+    检查文件是否可能是我们的加密文件（大小对齐、扩展名和文件头魔数规则）。
+    不需要密码的启发式判断：salt 恰好以较短魔数开头的加密文件会被误判为普通文件，解密流程不依赖它。
+    """
+    classifier = classifier or DEFAULT_CLASSIFIER
+    try:
         with open(file_path, 'rb') as f:
-            header = f.read(32)
-            return len(header) == 32
+            if not classifier.may_be_encrypted(file_path, os.fstat(f.fileno()).st_size):
+                return False
+            return not classifier.header_is_plain(f.read(HEADER_SIZE))
     except Exception:
         return False
 
-def decrypt_file(input_file_path, output_file_path=None, password="123456", keep_original=False, output_dir=None):
-    """解密单个文件 (静默模式)"""
-    if not os.path.exists(input_file_path):
-        return False, f"文件不存在: {input_file_path}"
+def _ensure_dir(path, dir_cache=None):
+    """创建目录；dir_cache 为一次批量处理共享的集合，同一目录只在第一次时访问文件系统"""
+    if not path or (dir_cache is not None and path in dir_cache):
+        return
+    os.makedirs(path, exist_ok=True)
+    if dir_cache is not None:
+        dir_cache.add(path)
 
-    if not output_file_path:
-        if output_dir:
-            filename = os.path.basename(input_file_path)
-            output_file_path = os.path.join(output_dir, filename)
-        else:
-            if input_file_path.lower().endswith('.enc'):
-                output_file_path = input_file_path[:-4]
+def _open_temp_output(output_file_path, buffering=-1):
+    """
+    在目标目录中创建临时输出文件，返回 (文件对象, 临时文件路径)。
+
+    临时文件名为 ".<文件名>.<随机串>.part"，与最终文件位于同一目录（同一文件系统），写完后由
+    os.replace 原子地替换到位；权限按 umask 创建，与直接创建输出文件时一致。
+    """
+    directory, name = os.path.split(output_file_path)
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+    while True:
+        temp_path = os.path.join(directory, f".{name}.{os.urandom(4).hex()}.part")
+        try:
+            fd = os.open(temp_path, flags, 0o666)
+        except FileExistsError:
+            continue
+        return os.fdopen(fd, 'wb', buffering=buffering), temp_path
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+def _fsync_dir(path):
+    """fsync 目录，使其中的重命名、创建持久化；不支持打开目录的平台（如 Windows）上忽略"""
+    try:
+        fd = os.open(path or os.curdir, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class Durability:
+    """
+    输出文件的持久化策略（线程安全）。所有输出都先写入同目录的临时文件，再用 os.replace 原子替换到位，
+    因此中途崩溃不会留下截断的明文；mode 决定在此基础上为持久化付出多少 fsync 开销:
+
+    - 'none': 不调用 fsync，由操作系统自行回写（默认，最快）。掉电时新输出可能丢失，而原始文件已删除。
+    - 'file': 每个文件在替换前 fsync 文件内容、替换后 fsync 所在目录，确认持久化后才删除原始文件。
+    - 'batch': 每累计 batch_files 个文件或经过 batch_seconds 秒同步一次（os.sync，不支持时逐个 fsync
+      待同步的文件），同步完成后才批量删除这一批的原始文件。单个文件不再单独 fsync，原始文件会晚一些删除。
+
+    批量模式下延迟删除原始文件时的错误记录在 errors 中；批量处理结束时必须调用 flush()。
+    """
+
+    MODES = ('none', 'file', 'batch')
+
+    def __init__(self, mode='none', batch_files=1000, batch_seconds=5.0):
+        if mode not in self.MODES:
+            raise ValueError(f"未知的持久化模式: {mode}")
+        self.mode = mode
+        self.batch_files = max(1, int(batch_files))
+        self.batch_seconds = batch_seconds
+        self.errors = []
+        self._pending = []      # [(输出文件, 待删除的原始文件或 None)]
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+
+    def file_written(self, f, stats=NO_STATS):
+        """输出已全部写入临时文件 f、即将替换到位时调用"""
+        if self.mode == 'file':
+            with stats.stage('sync'):
+                f.flush()
+                os.fsync(f.fileno())
+
+    def committed(self, output_path, original_path=None, stats=NO_STATS):
+        """
+        输出文件已替换到位。original_path 为需要删除的原始文件，在输出按当前策略持久化之后才删除。
+        立即删除失败时返回 OSError，否则返回 None（批量模式下的删除错误记录在 errors 中）。
+        """
+        if self.mode == 'batch':
+            with self._lock:
+                self._pending.append((output_path, original_path))
+                due = (len(self._pending) >= self.batch_files
+                       or time.monotonic() - self._last_sync >= self.batch_seconds)
+            if due:
+                self.flush(stats)
+            return None
+        if self.mode == 'file':
+            with stats.stage('sync'):
+                _fsync_dir(os.path.dirname(output_path))
+        if original_path:
+            try:
+                with stats.stage('remove'):
+                    os.remove(original_path)
+            except OSError as e:
+                return e
+        return None
+
+    def flush(self, stats=NO_STATS):
+        """批量模式下同步所有待持久化的输出，并删除对应的原始文件"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._last_sync = time.monotonic()
+        if not pending:
+            return
+        with stats.stage('sync'):
+            if hasattr(os, 'sync'):
+                os.sync()
+            else:
+                for output_path, _ in pending:
+                    try:
+                        with open(output_path, 'rb+') as f:
+                            os.fsync(f.fileno())
+                    except OSError:
+                        pass
+        for _, original_path in pending:
+            if original_path:
+                try:
+                    with stats.stage('remove'):
+                        os.remove(original_path)
+                except OSError as e:
+                    with self._lock:
+                        self.errors.append((original_path, str(e)))
+
+
+NO_DURABILITY = Durability()
+
+def resolve_durability(durability):
+    """durability 可以是 Durability 实例、模式名称或 None（不额外 fsync）"""
+    if durability is None:
+        return NO_DURABILITY
+    if isinstance(durability, Durability):
+        return durability
+    return Durability(durability)
+
+def decrypt_file(input_file_path, output_file_path=None, password="123456", keep_original=False, output_dir=None,
+                 chunk_size=CHUNK_SIZE, passwords=None, classifier=None, stats=None, progress=None,
+                 durability=None, workers=1):
+    """
+    解密单个文件 (静默模式，流式处理，内存占用恒定)
+
+    passwords 为候选密码列表时，会自动选择唯一能通过填充检查的密码，成功信息中注明匹配的密码编号；
+    多个候选同时通过时无法确定密码，按失败处理，不写出明文也不删除原始文件。
+    传入 RunStats 作为 stats 时，会记录各阶段（密钥派生、读取、解密、写出、删除）的耗时和字节数。
+    传入 BatchProgress 作为 progress 时，解密过程中按分块字节数推进进度。
+    输出先写入同目录的临时文件再原子替换到位；durability 为 'none' / 'file' / 'batch' 或 Durability 实例，
+    决定是否 fsync（单个文件的 'batch' 在返回前同步一次）。
+    workers > 1（None 或 0 表示全部 CPU 核心）时，不小于 PARALLEL_MIN_SIZE 的文件按段多核并行解密。
+    """
+    durability = resolve_durability(durability)
+    selector = PasswordSelector(passwords if passwords else [password])
+    stats = stats or NO_STATS
+    file_progress = None
+    if progress:
+        try:
+            file_size = os.path.getsize(input_file_path)
+        except OSError:
+            file_size = 0
+        progress.add_discovered(file_size)
+        progress.finish_scan()
+        stats = file_progress = _FileProgress(stats, progress)
+    outcome, message, matched = _decrypt_file(input_file_path, output_file_path, selector, keep_original,
+                                              output_dir, chunk_size, classifier, stats=stats,
+                                              durability=durability, workers=resolve_workers(workers))
+    durability.flush(stats)
+    if file_progress:
+        file_progress.file_done(file_size)
+        progress.notify()
+    if outcome == 'success' and passwords and len(selector.passwords) > 1:
+        message = f"{message} (密码 {selector.label(matched)})"
+    return outcome == 'success', message
+
+def _default_output_path(input_file_path, output_dir=None):
+    """计算默认输出路径：输出目录下的同名文件，或去掉 .enc 后缀 / 加上 .dec 后缀"""
+    if output_dir:
+        return os.path.join(output_dir, os.path.basename(input_file_path))
+    if input_file_path.lower().endswith('.enc'):
+        return input_file_path[:-4]
+    base_dir = os.path.dirname(input_file_path)
+    filename = os.path.basename(input_file_path)
+    return os.path.join(base_dir, f"{filename}.dec")
+
+def _decrypt_file(input_file_path, output_file_path, selector, keep_original=False, output_dir=None,
+                  chunk_size=CHUNK_SIZE, classifier=None, file_size=None, dir_cache=None, stats=NO_STATS,
+                  durability=NO_DURABILITY, workers=1, sniff_plain=False):
+    """
+    decrypt_file 的实现，返回 (结果类型, 信息, 匹配的密码)，结果类型为 'success' / 'failed' / 'plain'。
+
+    输入文件只打开一次：分类、密码预检和解密都在同一个文件句柄上完成。file_size 由调用方
+    （如目录扫描时的 DirEntry）提供时不再额外 stat。输出先写入同目录的临时文件再原子替换到位，
+    原始文件按 durability 策略在输出持久化之后删除。sniff_plain 为 True（目录处理）时，密码预检未通过
+    且文件头是常见明文格式的文件返回 'plain'；显式指定的单个文件不做魔数判断。
+    """
+    classifier = classifier or DEFAULT_CLASSIFIER
+    try:
+        src = open(input_file_path, 'rb')
+    except FileNotFoundError:
+        return 'failed', f"文件不存在: {input_file_path}", None
+    except OSError as e:
+        return 'failed', f"无法打开文件: {str(e)}", None
+
+    with src:
+        if file_size is None:
+            file_size = os.fstat(src.fileno()).st_size
+        if not classifier.may_be_encrypted(input_file_path, file_size):
+            return 'plain', f"文件可能不是加密文件: {input_file_path}", None
+
+        # 预检：只解密最后一个分组，密码错误时不做完整解密，也不写出任何内容
+        password, reason = selector.select_open(src, file_size, stats)
+        if password is None:
+            if sniff_plain:
+                src.seek(0)
+                if classifier.header_is_plain(src.read(HEADER_SIZE)):
+                    return 'plain', f"文件可能不是加密文件: {input_file_path}", None
+            return 'failed', f"解密失败，{reason}。", None
+
+        output_file_path = output_file_path or _default_output_path(input_file_path, output_dir)
+        temp_path = None
+        try:
+            _ensure_dir(os.path.dirname(output_file_path), dir_cache)
+            dst, temp_path = _open_temp_output(output_file_path)
+            with dst:
+                # 指定多个 workers 的超大文件映射后按段多核并行解密；其余大文件使用读取 / 解密 / 写出并发的
+                # 流水线；小文件通过 mmap 直接从页缓存读取，无法映射时退回到 readinto 流式读取
+                parallel = workers > 1 and file_size >= PARALLEL_MIN_SIZE
+                mapped = None
+                if parallel or file_size < PIPELINE_MIN_SIZE:
+                    try:
+                        mapped = mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ)
+                    except (OSError, ValueError):
+                        pass
+                if mapped is None:
+                    src.seek(0)
+                    if file_size >= PIPELINE_MIN_SIZE:
+                        decrypt_pipelined(src, dst, password, chunk_size, stats)
+                    else:
+                        decrypt_stream(src, dst, password, chunk_size, stats)
+                else:
+                    with mapped:
+                        if parallel:
+                            decrypt_parallel(mapped, dst, password, workers, SEGMENT_SIZE, chunk_size, stats)
+                        else:
+                            if hasattr(mapped, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                                mapped.madvise(mmap.MADV_SEQUENTIAL)
+                            decrypt_buffer(mapped, dst, password, chunk_size, stats)
+                durability.file_written(dst, stats)
+            os.replace(temp_path, output_file_path)
+        except Exception:
+            # 失败时只需删除临时文件，已存在的输出文件不受影响
+            if temp_path:
+                _remove_quietly(temp_path)
+            return 'failed', "解密失败，密码可能不正确或文件已损坏。", None
+
+    error = durability.committed(output_file_path, None if keep_original else input_file_path, stats)
+    if error:
+        return 'failed', f"解密成功，但无法删除原始文件: {str(error)}", password
+    
+    return 'success', "解密成功", password
+
+def _kernel_copy(src, dst):
+    """
+    在内核中复制文件内容（src、dst 为无缓冲的文件对象）：优先使用 copy_file_range，其次 sendfile，
+    都不支持时退回到 shutil.copyfileobj
+    """
+    src_fd, dst_fd = src.fileno(), dst.fileno()
+    if hasattr(os, 'copy_file_range'):
+        try:
+            while os.copy_file_range(src_fd, dst_fd, 1 << 30):
+                pass
+            return
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EPERM):
+                raise
+            src.seek(0)
+            dst.seek(0)
+            dst.truncate()
+    if hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+        try:
+            offset = 0
+            while True:
+                sent = os.sendfile(dst_fd, src_fd, offset, 1 << 30)
+                if not sent:
+                    return
+                offset += sent
+        except OSError as e:
+            if e.errno not in (errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                raise
+            src.seek(0)
+            dst.seek(0)
+            dst.truncate()
+    shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+def transfer_plain_file(src_path, dst_path, keep_original=False, hardlink=False, durability=None, stats=NO_STATS):
+    """
+    把普通（未加密）文件放到输出位置，返回实际使用的方式: 'rename' / 'link' / 'copy'。
+
+    不保留原始文件时先尝试 os.replace，同一文件系统上是 O(1) 的重命名；保留原始文件且 hardlink
+    为 True 时尝试创建硬链接（输出与原始文件共享数据，修改其一会影响另一个）。跨设备或不支持时
+    退回到内核态复制（copy_file_range / sendfile）并保留文件元数据：复制先写入同目录的临时文件再
+    原子替换到位，原始文件按 durability 策略在副本持久化之后删除。
+    """
+    durability = resolve_durability(durability)
+    if not keep_original:
+        try:
+            os.replace(src_path, dst_path)
+            durability.committed(dst_path, stats=stats)
+            return 'rename'
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+    elif hardlink:
+        try:
+            try:
+                os.link(src_path, dst_path)
+            except FileExistsError:
+                os.remove(dst_path)
+                os.link(src_path, dst_path)
+            durability.committed(dst_path, stats=stats)
+            return 'link'
+        except OSError:
+            pass
+
+    dst, temp_path = _open_temp_output(dst_path, buffering=0)
+    try:
+        with dst, open(src_path, 'rb', buffering=0) as src:
+            _kernel_copy(src, dst)
+            durability.file_written(dst, stats)
+        shutil.copystat(src_path, temp_path)
+        os.replace(temp_path, dst_path)
+    except BaseException:
+        _remove_quietly(temp_path)
+        raise
+    error = durability.committed(dst_path, None if keep_original else src_path, stats)
+    if error:
+        raise error
+    return 'copy'
+
+def _process_directory_file(file_path, file_size, directory_path, selector, keep_original, output_dir,
+                            classifier=None, dir_cache=None, stats=NO_STATS, hardlink=False,
+                            durability=NO_DURABILITY):
+    """
+    处理目录中的单个文件，返回 (结果类型, 匹配的密码)。
+    结果类型为 'success' / 'failed' / 'copied' / 'skipped'，只有 'success' 时才有匹配的密码。
+
+    file_size 来自目录扫描时的 DirEntry，分类不需要额外的 stat；可能是加密文件时只打开一次。
+    文件名表示加密文件（见 FileClassifier.claims_encrypted）但大小不符合加密格式的文件是损坏的密文，
+    结果为 'failed'，原样留在原处，不复制或移动到输出目录。
+    """
+    classifier = classifier or DEFAULT_CLASSIFIER
+    if not classifier.may_be_encrypted(file_path, file_size) and classifier.claims_encrypted(file_path):
+        return 'failed', None
+    target_path = None
+    if output_dir:
+        target_path = os.path.join(output_dir, os.path.relpath(file_path, directory_path))
+        _ensure_dir(os.path.dirname(target_path), dir_cache)
+    
+    if classifier.may_be_encrypted(file_path, file_size):
+        outcome, _, matched = _decrypt_file(file_path, target_path, selector, keep_original,
+                                            classifier=classifier, file_size=file_size, dir_cache=dir_cache,
+                                            stats=stats, durability=durability, sniff_plain=True)
+        if outcome != 'plain':
+            return outcome, matched
+    
+    if target_path:
+        start = time.perf_counter()
+        method = transfer_plain_file(file_path, target_path, keep_original, hardlink, durability, stats)
+        stats.record(method, time.perf_counter() - start, file_size)
+        return 'copied', None
+    return 'skipped', None
+
+def run_parallel(func, items, workers=1, executor=None):
+    """
+    对 items 中的每一项调用 func，按完成顺序逐个产出 (item, result)。
+
+    workers <= 1 时在当前线程中顺序执行；否则使用线程池并行执行。PBKDF2 (hashlib)
+    和 AES (pycryptodome) 在计算时都会释放 GIL，因此线程池可以占满多个核心。
+    同时在途的任务数量有上限，不会一次性为所有文件创建 Future。
+    传入 executor 时在这个共享的线程池中执行（同时提交最多 workers 个任务），不另建线程池。
+    """
+    if executor is not None:
+        yield from _run_in_executor(executor, func, items, workers)
+        return
+    if workers <= 1:
+        for item in items:
+            yield item, func(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from _run_in_executor(executor, func, items, workers * 4)
+
+def _run_in_executor(executor, func, items, max_pending):
+    pending = {}
+    for item in items:
+        pending[executor.submit(func, item)] = item
+        if len(pending) >= max_pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
+    for future in as_completed(pending):
+        yield pending[future], future.result()
+
+def resolve_workers(workers):
+    """将 workers 参数规范化为正整数；None 或 0 表示使用全部 CPU 核心"""
+    if not workers:
+        return os.cpu_count() or 1
+    return max(1, int(workers))
+
+def format_summary(counts, password_counts=None):
+    """将统计结果格式化为摘要信息；password_counts 为 {密码编号: 文件数} 时附带各密码的匹配数"""
+    message = (f"处理完成! 成功: {counts['success']}, 失败: {counts['failed']}, "
+               f"复制: {counts['copied']}, 跳过: {counts['skipped']}")
+    if counts.get('resumed'):
+        message += f", 续传跳过: {counts['resumed']}"
+    if password_counts:
+        matched = ", ".join(f"{label}: {count}" for label, count in sorted(password_counts.items()))
+        message += f"\n密码匹配: {matched}"
+    return message
+
+def iter_directory(directory_path, recursive=False, exclude=None, with_mtime=False):
+    """
+    惰性遍历目录，逐个产出 (文件路径, 文件大小)；with_mtime 为 True 时产出 (文件路径, 文件大小, 修改时间纳秒)。
+
+    使用 os.scandir 递归，文件大小取自 DirEntry.stat()（Windows 上由目录项直接给出，其他平台
+    每个文件一次 stat），后续分类不再需要访问文件。每个目录的条目在产出前先完整读出，因此原地
+    解密时新写出的文件不会被再次遍历到；exclude 中的目录（如位于输入目录内的输出目录）会被跳过。
+    """
+    excluded = {os.path.realpath(p) for p in exclude if p} if exclude else None
+    pending = [directory_path]
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = list(it)
+        except OSError:
+            if current is directory_path:
+                raise
+            continue
+        subdirs = []
+        for entry in entries:
+            try:
+                if entry.is_file():
+                    st = entry.stat()
+                    yield (entry.path, st.st_size, st.st_mtime_ns) if with_mtime else (entry.path, st.st_size)
+                elif recursive and entry.is_dir(follow_symlinks=False):
+                    if excluded and os.path.realpath(entry.path) in excluded:
+                        continue
+                    subdirs.append(entry.path)
+            except OSError:
+                continue
+        pending.extend(reversed(subdirs))
+
+_SCAN_DONE = object()
+
+class DirectoryScanner:
+    """
+    在后台线程中遍历目录，通过有界队列把 (文件路径, 文件大小) 交给处理方。
+
+    处理可以在扫描刚开始时就启动，不必等待整棵目录树列完；队列有上限，扫描不会无限领先于处理。
+    扫描完成前 discovered 表示"目前已发现"的文件数，finished 为 True 后即为总数。
+    """
+
+    def __init__(self, directory_path, recursive=False, exclude=None, queue_size=10000, progress=None,
+                 with_mtime=False):
+        self.discovered = 0
+        self.progress = progress
+        self.finished = False
+        self.error = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(directory_path, recursive, exclude, with_mtime),
+                                        daemon=True)
+        self._thread.start()
+
+    def _run(self, directory_path, recursive, exclude, with_mtime):
+        try:
+            for item in iter_directory(directory_path, recursive, exclude, with_mtime):
+                if self._stop.is_set():
+                    return
+                self.discovered += 1
+                if self.progress:
+                    self.progress.add_discovered(item[1])
+                self._put(item)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = True
+            if self.progress:
+                self.progress.finish_scan()
+            self._put(_SCAN_DONE)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def __iter__(self):
+        while True:
+            item = self._queue.get()
+            if item is _SCAN_DONE:
+                if self.error:
+                    raise self.error
+                return
+            yield item
+
+    def close(self):
+        """停止扫描（处理方提前退出时调用）"""
+        self._stop.set()
+
+class _Inotify:
+    """通过 ctypes 调用 Linux inotify，不依赖第三方库；不可用时构造函数抛出 OSError"""
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+                  | IN_DELETE_SELF)
+    _EVENT = struct.Struct('iIII')
+
+    def __init__(self):
+        if not sys.platform.startswith('linux'):
+            raise OSError(errno.ENOSYS, "inotify 只在 Linux 上可用")
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self._dirs = {}
+
+    def add_watch(self, path):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), self.WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        self._dirs[wd] = path
+
+    def read(self, timeout):
+        """等待至多 timeout 秒，返回 [(路径, mask)]；队列溢出时返回 [(None, IN_Q_OVERFLOW)]"""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = data[offset:offset + name_len].rstrip(b'\0')
+            offset += name_len
+            if mask & self.IN_Q_OVERFLOW:
+                events.append((None, mask))
+                continue
+            directory = self._dirs.get(wd)
+            if mask & self.IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+            if directory is not None:
+                events.append((os.path.join(directory, os.fsdecode(name)) if name else directory, mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class DirectoryWatcher:
+    """
+    持续监视目录，产出新到达且已写完的文件。
+
+    Linux 上使用 inotify 即时获知新文件（递归时新建的子目录会自动加入监视），其他平台或 inotify 不可用时
+    每 poll_interval 秒重新遍历一次目录。文件的大小和修改时间连续 settle_seconds 秒不变才视为写完，
+    避免处理同步程序尚未写完的文件。启动时目录中已有的文件同样会被处理；已产出的文件只有再次变化时才会
+    重新产出。以 "." 开头、".part" 结尾的临时输出文件会被忽略。
+    """
+
+    def __init__(self, directory_path, recursive=False, exclude=None, settle_seconds=1.0, poll_interval=2.0,
+                 use_inotify=True):
+        self.directory_path = directory_path
+        self.recursive = recursive
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self._excluded = {os.path.realpath(p) for p in exclude if p} if exclude else set()
+        self._candidates = {}   # 路径 -> (大小, 修改时间, 最近一次变化的时刻)
+        self._seen = {}         # 已产出的路径 -> (大小, 修改时间)
+        self._inotify = None
+        if use_inotify:
+            try:
+                self._inotify = _Inotify()
+            except (OSError, AttributeError):
+                self._inotify = None
+        self.backend = 'inotify' if self._inotify else 'poll'
+        self._next_scan = 0.0
+        self._scan(directory_path)
+
+    def _scan(self, directory_path):
+        """遍历目录（inotify 模式下同时为各目录添加监视），登记其中的文件"""
+        if self._inotify:
+            self._watch_tree(directory_path)
+        present = set()
+        for file_path, file_size, mtime_ns in iter_directory(directory_path, self.recursive, self._excluded,
+                                                             with_mtime=True):
+            present.add(file_path)
+            self._touch(file_path, file_size, mtime_ns)
+        if directory_path == self.directory_path:
+            # 完整遍历时清理已经不存在的文件
+            for file_path in [p for p in self._seen if p not in present]:
+                del self._seen[file_path]
+        self._next_scan = time.monotonic() + self.poll_interval
+
+    def _watch_tree(self, directory_path):
+        pending = [directory_path]
+        while pending:
+            current = pending.pop()
+            try:
+                self._inotify.add_watch(current)
+                if not self.recursive:
+                    continue
+                with os.scandir(current) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False) and os.path.realpath(entry.path) not in self._excluded:
+                            pending.append(entry.path)
+            except OSError:
+                continue
+
+    @staticmethod
+    def _ignored(file_path):
+        name = os.path.basename(file_path)
+        return name.startswith('.') and name.endswith('.part')
+
+    def _touch(self, file_path, file_size, mtime_ns):
+        if self._ignored(file_path):
+            return
+        state = (file_size, mtime_ns)
+        if self._seen.get(file_path) == state:
+            return
+        candidate = self._candidates.get(file_path)
+        if candidate is None or candidate[:2] != state:
+            self._candidates[file_path] = (file_size, mtime_ns, time.monotonic())
+
+    def _stat(self, file_path):
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            self._candidates.pop(file_path, None)
+            self._seen.pop(file_path, None)
+            return
+        if not os.path.isdir(file_path):
+            self._touch(file_path, st.st_size, st.st_mtime_ns)
+
+    def _handle_events(self, events):
+        for path, mask in events:
+            if path is None:
+                # 事件队列溢出：重新遍历整个目录
+                self._scan(self.directory_path)
+            elif mask & _Inotify.IN_ISDIR:
+                if self.recursive and mask & (_Inotify.IN_CREATE | _Inotify.IN_MOVED_TO):
+                    if os.path.realpath(path) not in self._excluded:
+                        # 新目录在加入监视之前可能已经有文件写入
+                        self._scan(path)
+            elif mask & (_Inotify.IN_DELETE | _Inotify.IN_MOVED_FROM):
+                self._candidates.pop(path, None)
+                self._seen.pop(path, None)
+            elif not mask & _Inotify.IN_DELETE_SELF:
+                self._stat(path)
+
+    def wait(self, timeout=None):
+        """
+        等待至多 timeout 秒（None 表示一直等待），返回已写完的文件 [(路径, 大小)]；期间没有文件就绪时返回空列表
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            ready = []
+            for file_path, (_, _, changed_at) in list(self._candidates.items()):
+                if now - changed_at < self.settle_seconds:
+                    continue
+                size, mtime_ns = self._candidates.pop(file_path)[:2]
+                try:
+                    st = os.stat(file_path)
+                except OSError:
+                    continue
+                if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                    self._touch(file_path, st.st_size, st.st_mtime_ns)
+                    continue
+                self._seen[file_path] = (size, mtime_ns)
+                ready.append((file_path, size))
+            if ready:
+                return ready
+            if deadline is not None and now >= deadline:
+                return []
+
+            # 下一次需要醒来的时刻：最早的候选文件稳定、下一次轮询、或调用方的超时
+            wake = [changed_at + self.settle_seconds for _, _, changed_at in self._candidates.values()]
+            if not self._inotify:
+                wake.append(self._next_scan)
+            if deadline is not None:
+                wake.append(deadline)
+            delay = max(0.0, min(wake) - time.monotonic()) if wake else None
+            if self._inotify:
+                self._handle_events(self._inotify.read(delay))
             else:
-                base_dir = os.path.dirname(input_file_path)
-                filename = os.path.basename(input_file_path)
-                output_file_path = os.path.join(base_dir, f"{filename}.dec")
+                if delay:
+                    time.sleep(delay)
+                if time.monotonic() >= self._next_scan:
+                    self._scan(self.directory_path)
+
+    def mark_seen(self, file_path):
+        """登记一个由调用方自己写出的文件（如原地解密的输出），它不会被当作新到达的文件产出"""
+        try:
+            st = os.stat(file_path)
+        except OSError:
+            return
+        self._candidates.pop(file_path, None)
+        self._seen[file_path] = (st.st_size, st.st_mtime_ns)
+
+    def forget(self, file_path):
+        """文件已被处理方删除或移走"""
+        self._candidates.pop(file_path, None)
+        self._seen.pop(file_path, None)
+
+    def close(self):
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
+
+class BatchJournal:
+    """
+    批量解密的进度日志 (SQLite)，记录每个处理完的输入文件的路径、大小、修改时间和结果，用于中断后续传。
+
+    打开时把已完成（成功、复制、跳过）的记录载入内存，续传时每个文件只需一次字典查找；大小或修改时间
+    变化的文件、失败的文件和新文件会重新处理。写入按批提交（每 commit_every 条或 commit_seconds 秒），
+    提交前先按 durability 策略同步输出，日志中记为完成的文件不会早于其输出持久化。
+    """
+
+    DONE_OUTCOMES = ('success', 'copied', 'skipped')
+
+    def __init__(self, path, commit_every=1000, commit_seconds=5.0):
+        self.path = path
+        self.commit_every = max(1, commit_every)
+        self.commit_seconds = commit_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+                           "mtime_ns INTEGER NOT NULL, outcome TEXT NOT NULL)")
+        self._conn.commit()
+        placeholders = ", ".join("?" * len(self.DONE_OUTCOMES))
+        self._done = {path: (size, mtime_ns) for path, size, mtime_ns in self._conn.execute(
+            f"SELECT path, size, mtime_ns FROM files WHERE outcome IN ({placeholders})", self.DONE_OUTCOMES)}
+        self._own_names = {os.path.basename(path) + suffix for suffix in ('', '-wal', '-shm', '-journal')}
+        self._own_dir = os.path.dirname(os.path.realpath(path))
+        self._uncommitted = 0
+        self._last_commit = time.monotonic()
+
+    def reset(self):
+        """清空日志，重新开始记录"""
+        with self._lock:
+            self._conn.execute("DELETE FROM files")
+            self._conn.commit()
+            self._done.clear()
+
+    def is_done(self, file_path, file_size, mtime_ns):
+        """文件此前已成功处理且大小、修改时间都没有变化"""
+        return self._done.get(os.path.abspath(file_path)) == (file_size, mtime_ns)
+
+    def owns(self, file_path):
+        """是否为日志自身的数据库文件（日志位于被处理的目录中时需要跳过）"""
+        return (os.path.basename(file_path) in self._own_names
+                and os.path.dirname(os.path.realpath(file_path)) == self._own_dir)
+
+    def record(self, file_path, file_size, mtime_ns, outcome, durability=NO_DURABILITY, stats=NO_STATS):
+        """记录一个处理完的文件；达到提交条件时先同步输出再提交"""
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO files (path, size, mtime_ns, outcome) VALUES (?, ?, ?, ?)",
+                               (os.path.abspath(file_path), file_size, mtime_ns, outcome))
+            self._uncommitted += 1
+            due = (self._uncommitted >= self.commit_every
+                   or time.monotonic() - self._last_commit >= self.commit_seconds)
+        if due:
+            self.commit(durability, stats)
+
+    def commit(self, durability=NO_DURABILITY, stats=NO_STATS):
+        durability.flush(stats)
+        with self._lock:
+            self._conn.commit()
+            self._uncommitted = 0
+            self._last_commit = time.monotonic()
+
+    def close(self, durability=NO_DURABILITY, stats=NO_STATS):
+        self.commit(durability, stats)
+        with self._lock:
+            self._conn.close()
+
+def decrypt_directory(directory_path, password="123456", recursive=False, keep_original=False, output_dir=None,
+                      progress_callback=None, workers=1, passwords=None, file_callback=None, classifier=None,
+                      stats=None, progress=None, hardlink=False, durability=None, journal=None, resume=False,
+                      executor=None):
+    """
+    解密目录中的所有加密文件，并复制其他文件 (静默模式)
+
+    workers > 1 时并行处理多个文件（None 或 0 表示使用全部 CPU 核心）。
+    progress_callback(done, total) 始终在调用方线程中、每处理完一个文件调用一次。目录在后台边扫描边处理，
+    扫描完成前 total 为目前已发现的文件数。
+    passwords 为候选密码列表时，每个文件自动选择匹配的密码；file_callback(file_path, outcome, label)
+    会在调用方线程中报告每个文件的结果和匹配的密码编号（如 "#2"，未解密时为 None）。
+    classifier 为 FileClassifier，可自定义加密文件的扩展名和魔数规则。
+    传入 RunStats 作为 stats 时，运行结束后其中包含各阶段累计耗时、字节数、文件大小分布和最慢的文件，
+    可通过 stats.to_dict() 得到可序列化的结果。
+    传入 BatchProgress 作为 progress 时，会按字节持续更新进度（大文件在解密过程中按分块推进），
+    可供界面定时读取，或通过 BatchProgress 的 callback(bytes_done, bytes_total, files_done, files_total) 接收。
+    普通文件在同一文件系统上直接重命名到输出目录；保留原始文件且 hardlink 为 True 时创建硬链接。
+    所有输出都先写入临时文件再原子替换到位；durability 为 'none' / 'file' / 'batch' 或 Durability 实例
+    （可指定批量同步的文件数和时间间隔），原始文件总是在对应输出按该策略持久化之后才删除。
+    journal 为进度日志路径或 BatchJournal 时记录每个处理完的文件；resume 为 True 时跳过日志中已完成且
+    大小、修改时间未变的文件，只重试失败的文件和新文件，否则清空日志重新记录。
+    executor 为共享线程池时文件在其中处理（同时最多 workers 个），不另建线程池。
+    """
+    if not os.path.isdir(directory_path):
+        return False, f"错误: 目录不存在: {directory_path}"
     
-    os.makedirs(os.path.dirname(output_file_path), exist_ok=True)
+    counts = {'success': 0, 'failed': 0, 'copied': 0, 'skipped': 0, 'resumed': 0}
+    selector = PasswordSelector(passwords if passwords else [password])
+    password_counts = {}
     
+    durability = resolve_durability(durability)
+    known_errors = len(durability.errors)
+    run_stats = stats or NO_STATS
+    owns_journal = isinstance(journal, (str, os.PathLike))
+    if owns_journal:
+        try:
+            journal = BatchJournal(journal)
+        except sqlite3.Error as e:
+            return False, f"无法打开进度日志: {str(e)}"
+    if journal and not resume:
+        journal.reset()
+    scanner = DirectoryScanner(directory_path, recursive, exclude=[output_dir], progress=progress,
+                               with_mtime=journal is not None)
     try:
-        with open(input_file_path, 'rb') as f:
-            encrypted_data = f.read()
-        
-        if not is_encrypted_file(input_file_path):
-             return False, f"文件可能不是加密文件: {input_file_path}"
+        dir_cache = set()
 
-        decrypted_data = decrypt_data(encrypted_data, password)
-        
-        with open(output_file_path, 'wb') as f:
-            f.write(decrypted_data)
+        def pending_items():
+            # 在调用方线程中过滤掉日志自身和已完成的文件，每个文件一次字典查找
+            for item in scanner:
+                owned = journal.owns(item[0])
+                if owned or (resume and journal.is_done(*item)):
+                    if not owned:
+                        counts['resumed'] += 1
+                    if progress:
+                        progress.file_done(item[1])
+                    continue
+                yield item
+
+        def process(item):
+            file_path, file_size = item[:2]
+            file_stats = _FileProgress(run_stats, progress) if progress else run_stats
+            start = time.perf_counter()
+            result = _process_directory_file(file_path, file_size, directory_path, selector, keep_original,
+                                             output_dir, classifier, dir_cache, file_stats, hardlink,
+                                             durability)
+            run_stats.add_file(file_path, file_size, time.perf_counter() - start, result[0])
+            if progress:
+                file_stats.file_done(file_size)
+            return result
+
+        outcomes = run_parallel(process, pending_items() if journal else scanner, resolve_workers(workers), executor)
+        for item, (outcome, matched) in outcomes:
+            file_path = item[0]
+            counts[outcome] += 1
+            if journal:
+                journal.record(*item, outcome, durability, run_stats)
+            label = selector.label(matched) if matched is not None else None
+            if label:
+                password_counts[label] = password_counts.get(label, 0) + 1
+            if file_callback:
+                file_callback(file_path, outcome, label)
+            if progress_callback:
+                progress_callback(sum(counts.values()), scanner.discovered)
         
-        if not keep_original:
-            os.remove(input_file_path)
+        durability.flush(run_stats)
+        message = format_summary(counts, password_counts if len(selector.passwords) > 1 else None)
+        removal_errors = len(durability.errors) - known_errors
+        if removal_errors:
+            message += f"\n{removal_errors} 个原始文件未能删除"
+        return True, message
         
-        return True, "解密成功"
-    except Exception:
-        return False, "解密失败，密码可能不正确或文件已损坏。"
+    except Exception as e:
+        return False, f"处理目录时出错: {str(e)}"
+    finally:
+        scanner.close()
+        # 中断时也同步并删除已完成输出对应的原始文件，并提交已记录的进度
+        durability.flush(run_stats)
+        if journal:
+            if owns_journal:
+                journal.close(durability, run_stats)
+            else:
+                journal.commit(durability, run_stats)
+        if stats:
+            stats.finish()
+        if progress:
+            progress.notify()
+
+def watch_directory(directory_path, password="123456", recursive=False, keep_original=False, output_dir=None,
+                    workers=1, passwords=None, file_callback=None, classifier=None, stats=None, hardlink=False,
+                    durability=None, settle_seconds=1.0, poll_interval=2.0, use_inotify=True, stop_event=None,
+                    ready_callback=None):
+    """
+    监视目录并持续解密新到达的文件，直到 stop_event（threading.Event）被设置，返回 (是否成功, 汇总信息)。
 
-def decrypt_directory(directory_path, password="123456", recursive=False, keep_original=False, output_dir=None, progress_callback=None):
-    """解密目录中的所有加密文件，并复制其他文件 (静默模式)"""
+    新文件由 DirectoryWatcher 发现并等待写完，每批就绪的文件交给常驻线程池并行处理（workers 个），
+    进程内的派生密钥缓存在整个监视期间保持，同一密码和 salt 不会重复派生。file_callback(file_path, outcome, label)
+    与 decrypt_directory 相同；ready_callback(watcher) 在开始监视后调用一次（可读取 watcher.backend）。
+    其余参数同 decrypt_directory。原地解密时写出的明文不会被再次当作新文件处理。
+    """
     if not os.path.isdir(directory_path):
         return False, f"错误: 目录不存在: {directory_path}"
+
+    counts = {'success': 0, 'failed': 0, 'copied': 0, 'skipped': 0}
+    selector = PasswordSelector(passwords if passwords else [password])
+    password_counts = {}
+    durability = resolve_durability(durability)
+    run_stats = stats or NO_STATS
+    stop_event = stop_event or threading.Event()
+    workers = resolve_workers(workers)
+    watcher = DirectoryWatcher(directory_path, recursive, [output_dir], settle_seconds, poll_interval, use_inotify)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decrypt-watch") if workers > 1 else None
+    try:
+        dir_cache = set()
+        if ready_callback:
+            ready_callback(watcher)
+
+        def process(item):
+            file_path, file_size = item
+            start = time.perf_counter()
+            result = _process_directory_file(file_path, file_size, directory_path, selector, keep_original,
+                                             output_dir, classifier, dir_cache, run_stats, hardlink, durability)
+            run_stats.add_file(file_path, file_size, time.perf_counter() - start, result[0])
+            return result
+
+        try:
+            while not stop_event.is_set():
+                ready = watcher.wait(timeout=0.5)
+                for (file_path, _), (outcome, matched) in run_parallel(process, ready, workers, executor):
+                    counts[outcome] += 1
+                    if outcome == 'success' and not output_dir:
+                        watcher.mark_seen(_default_output_path(file_path))
+                    if not os.path.exists(file_path):
+                        watcher.forget(file_path)
+                    label = selector.label(matched) if matched is not None else None
+                    if label:
+                        password_counts[label] = password_counts.get(label, 0) + 1
+                    if file_callback:
+                        file_callback(file_path, outcome, label)
+                if ready:
+                    durability.flush(run_stats)
+        except KeyboardInterrupt:
+            # Ctrl+C 与 stop_event 相同：等正在处理的文件完成后返回汇总
+            pass
+
+        return True, format_summary(counts, password_counts if len(selector.passwords) > 1 else None)
+
+    except Exception as e:
+        return False, f"监视目录时出错: {str(e)}"
+    finally:
+        if executor:
+            executor.shutdown(wait=True)
+        watcher.close()
+        durability.flush(run_stats)
+        if stats:
+            stats.finish()
+
+def audit_directory(directory_path, password="123456", recursive=False, progress_callback=None, workers=1,
+                    passwords=None, classifier=None):
+    """
+    批量校验目录中的加密文件是否仍可用指定密码解密 (静默模式，只读，不写出明文)
+
+    每个文件只读取文件头和最后两个分组，耗时取决于密钥派生而不是文件大小。passwords 为候选密码列表时，
+    任一候选密码通过即视为通过。classifier 判断为普通文件的文件计为跳过，不算未通过。
+    返回 (是否成功, 摘要信息, 结果列表)，结果列表中每一项为 (文件路径, 是否通过, 原因)，不包含跳过的文件。
+    """
+    if not os.path.isdir(directory_path):
+        return False, f"错误: 目录不存在: {directory_path}", []
     
-    decrypt_success_count = 0
-    decrypt_failed_count = 0
-    copy_count = 0
+    results = []
+    passed_count = 0
     skipped_count = 0
+    selector = PasswordSelector(passwords if passwords else [password])
+    classifier = classifier or DEFAULT_CLASSIFIER
     
+    scanner = DirectoryScanner(directory_path, recursive)
     try:
-        if recursive:
-            all_files = [str(p) for p in Path(directory_path).rglob('*') if p.is_file()]
-        else:
-            all_files = [str(p) for p in Path(directory_path).glob('*') if p.is_file()]
-
-        total_files = len(all_files)
-        for i, file_path in enumerate(all_files):
-            if progress_callback:
-                progress_callback(i + 1, total_files)
+        def check(item):
+            return _audit_file(item[0], selector, classifier, item[1])
 
-            rel_path = os.path.relpath(file_path, directory_path)
-            
-            if output_dir:
-                target_path = os.path.join(output_dir, rel_path)
-                os.makedirs(os.path.dirname(target_path), exist_ok=True)
-                
-                if is_encrypted_file(file_path):
-                    success, _ = decrypt_file(file_path, target_path, password, keep_original)
-                    if success:
-                        decrypt_success_count += 1
-                    else:
-                        decrypt_failed_count += 1
-                else:
-                    import shutil
-                    shutil.copy2(file_path, target_path)
-                    copy_count += 1
-                    if not keep_original:
-                        os.remove(file_path)
+        checked = run_parallel(check, scanner, resolve_workers(workers))
+        for i, ((file_path, _), (outcome, reason, _)) in enumerate(checked):
+            if outcome == 'skipped':
+                skipped_count += 1
             else:
-                if is_encrypted_file(file_path):
-                    success, _ = decrypt_file(file_path, None, password, keep_original)
-                    if success:
-                        decrypt_success_count += 1
-                    else:
-                        decrypt_failed_count += 1
-                else:
-                    skipped_count += 1
-        
-        message = (f"处理完成! 成功: {decrypt_success_count}, 失败: {decrypt_failed_count}, "
-                   f"复制: {copy_count}, 跳过: {skipped_count}")
-        return True, message
+                results.append((file_path, outcome == 'passed', reason))
+                if outcome == 'passed':
+                    passed_count += 1
+            if progress_callback:
+                progress_callback(i + 1, scanner.discovered)
         
+        message = (f"校验完成! 通过: {passed_count}, 未通过: {len(results) - passed_count}, "
+                   f"跳过: {skipped_count}")
+        return True, message, results
+    
+    except Exception as e:
+        return False, f"校验目录时出错: {str(e)}", results
+    finally:
+        scanner.close()
+
+# --- Re-encryption ---
+
+def rekey_stream(src, dst, old_password, new_password, chunk_size=CHUNK_SIZE, stats=NO_STATS):
+    """
+    流式更换密码：从 src 读取旧密码加密的数据，用新密码重新加密写入 dst，返回写入的字节数。
+
+    新文件使用新的随机 salt 和 IV，密钥按 derive_key 相同的 PBKDF2 参数派生，格式仍为 salt + IV + AES-CBC。
+    明文只在内存中的两个 chunk_size 缓冲区里出现，不会落盘。PKCS7 填充只取决于明文长度，新旧密文的填充相同，
+    因此最后一个分组解密后只需校验填充、无需去除再重新填充；填充无效（旧密码错误或数据损坏）时抛出 ValueError。
+    """
+    if chunk_size <= 0 or chunk_size % BLOCK_SIZE:
+        raise ValueError(f"chunk_size 必须是 {BLOCK_SIZE} 的正整数倍")
+
+    header = src.read(HEADER_SIZE)
+    while len(header) < HEADER_SIZE:
+        more = src.read(HEADER_SIZE - len(header))
+        if not more:
+            raise ValueError("文件头不完整")
+        header += more
+    old_key = get_key(old_password, header[:SALT_SIZE], stats=stats)
+    decryptor = _cbc_decryptor(old_key, header[SALT_SIZE:])
+
+    salt = os.urandom(SALT_SIZE)
+    iv = os.urandom(IV_SIZE)
+    new_key = get_key(new_password, salt, stats=stats)
+    encryptor = _cbc_encryptor(new_key, iv)
+    written = dst.write(salt + iv)
+
+    cipher_buf = memoryview(bytearray(chunk_size))
+    plain_buf = memoryview(bytearray(chunk_size))
+    payload_size = 0
+    while True:
+        n = 0
+        start = time.perf_counter()
+        while n < chunk_size:
+            got = src.readinto(cipher_buf[n:])
+            if not got:
+                break
+            n += got
+        stats.record('read', time.perf_counter() - start, n)
+        if n % BLOCK_SIZE:
+            raise ValueError("密文长度不是分组长度的整数倍")
+        payload_size += n
+        if n:
+            start = time.perf_counter()
+            decryptor.decrypt(cipher_buf[:n], output=plain_buf[:n])
+            if n < chunk_size and not _has_valid_padding(plain_buf[n - BLOCK_SIZE:n]):
+                raise ValueError("Padding is incorrect.")
+            encryptor.encrypt(plain_buf[:n], output=cipher_buf[:n])
+            encrypted = time.perf_counter()
+            written += dst.write(cipher_buf[:n])
+            stats.record('aes', encrypted - start, n)
+            stats.record('write', time.perf_counter() - encrypted, n)
+        if n < chunk_size:
+            break
+    if not payload_size:
+        raise ValueError("密文长度不是分组长度的整数倍")
+    if payload_size % chunk_size == 0:
+        # 密文恰好是 chunk_size 的整数倍时，最后一块在循环中无法识别，读到文件末尾后再校验填充
+        if not _has_valid_padding(plain_buf[chunk_size - BLOCK_SIZE:chunk_size]):
+            raise ValueError("Padding is incorrect.")
+    return written
+
+def rekey_file(input_file_path, old_password, new_password, output_file_path=None, passwords=None,
+               chunk_size=CHUNK_SIZE, classifier=None, stats=None, durability=None):
+    """
+    更换单个加密文件的密码，返回 (是否成功, 信息)。
+
+    默认原地更换：新密文写入同目录的临时文件，完成后用 os.replace 原子替换原文件（保留权限位），
+    任何时刻磁盘上都只有完整的旧文件或完整的新文件。output_file_path 指定时写到该路径，原文件不变。
+    passwords 为旧密码的候选列表。已经使用新密码的文件视为成功并跳过。
+    文件格式没有完整性校验，密码只能通过填充检查确认（错误密码约有 1/256 的概率通过），因此新密码和
+    全部候选旧密码都会检查，只有恰好一个旧密码通过且新密码不通过时才重新加密；有歧义的文件报告为失败，
+    保持不变。durability 为 'batch' 时在返回前同步一次，与 decrypt_file 一致。
+    """
+    durability = resolve_durability(durability)
+    stats = stats or NO_STATS
+    outcome, message, _ = _rekey_file(input_file_path, PasswordSelector(passwords if passwords else [old_password]),
+                                   new_password, output_file_path, chunk_size, classifier,
+                                   stats=stats, durability=durability)
+    durability.flush(stats)
+    return outcome != 'failed', message
+
+def _rekey_file(input_file_path, selector, new_password, output_file_path=None, chunk_size=CHUNK_SIZE,
+                classifier=None, file_size=None, stats=NO_STATS, durability=NO_DURABILITY):
+    """rekey_file 的实现，返回 (结果类型, 信息, 匹配的旧密码)，结果类型为 'success' / 'failed' / 'skipped'"""
+    classifier = classifier or DEFAULT_CLASSIFIER
+    output_file_path = output_file_path or input_file_path
+    try:
+        src = open(input_file_path, 'rb')
+    except OSError as e:
+        return 'failed', f"无法打开文件: {str(e)}", None
+
+    temp_path = None
+    with src:
+        if file_size is None:
+            file_size = os.fstat(src.fileno()).st_size
+        if not classifier.may_be_encrypted(input_file_path, file_size):
+            if classifier.claims_encrypted(input_file_path):
+                return 'failed', "文件大小不符合加密格式，可能已截断或损坏", None
+            return 'skipped', "不是加密文件", None
+        # 填充检查对错误密码约有 1/256 的误判，原地替换后原数据无法恢复，因此新密码和每个候选旧密码都要
+        # 检查：只有恰好一个旧密码通过且新密码不通过时才重新加密，其余有歧义的情况都不修改文件
+        new_ok = _check_password(src, file_size, new_password, stats)[0]
+        old_matches = [p for p in selector.matches_open(src, file_size, stats) if p != new_password]
+        if old_matches:
+            labels = ", ".join(selector.label(p) for p in old_matches)
+            if new_ok:
+                return 'failed', f"新密码和旧密码 ({labels}) 都通过了填充检查，无法确定当前密码，文件未修改", None
+            if len(old_matches) > 1:
+                return 'failed', f"多个旧密码 ({labels}) 都通过了填充检查，无法确定当前密码，文件未修改", None
+        elif new_ok:
+            return 'skipped', "已使用新密码", None
+        else:
+            src.seek(0)
+            if classifier.header_is_plain(src.read(HEADER_SIZE)):
+                return 'skipped', "不是加密文件", None
+            return 'failed', "旧密码不正确或文件已损坏", None
+        old_password = old_matches[0]
+        try:
+            dst, temp_path = _open_temp_output(output_file_path)
+            with dst:
+                src.seek(0)
+                rekey_stream(src, dst, old_password, new_password, chunk_size, stats)
+                durability.file_written(dst, stats)
+            shutil.copymode(input_file_path, temp_path)
+            os.replace(temp_path, output_file_path)
+        except Exception as e:
+            if temp_path:
+                _remove_quietly(temp_path)
+            return 'failed', f"重新加密失败: {str(e)}", None
+    durability.committed(output_file_path, stats=stats)
+    return 'success', "重新加密成功", old_password
+
+def rekey_directory(directory_path, old_password, new_password, recursive=False, workers=1, passwords=None,
+                    file_callback=None, classifier=None, stats=None, progress=None, durability=None):
+    """
+    原地更换目录中所有加密文件的密码，返回 (是否成功, 汇总信息)。
+
+    与 decrypt_directory 相同，目录在后台边扫描边处理，workers 个文件并行（None 或 0 表示全部 CPU 核心），
+    每个文件单趟流式解密再加密并原子替换。file_callback(file_path, outcome, label) 在调用方线程中报告
+    每个文件的结果（'success' / 'failed' / 'skipped'）和匹配的旧密码编号。中断后重新运行时，已更换的文件
+    会因为已使用新密码而被跳过。
+    """
+    if not os.path.isdir(directory_path):
+        return False, f"错误: 目录不存在: {directory_path}"
+
+    counts = {'success': 0, 'failed': 0, 'skipped': 0}
+    selector = PasswordSelector(passwords if passwords else [old_password])
+    durability = resolve_durability(durability)
+    run_stats = stats or NO_STATS
+    scanner = DirectoryScanner(directory_path, recursive, progress=progress)
+    try:
+        def process(item):
+            file_path, file_size = item
+            file_stats = _FileProgress(run_stats, progress) if progress else run_stats
+            start = time.perf_counter()
+            outcome, _, matched = _rekey_file(file_path, selector, new_password, classifier=classifier,
+                                              file_size=file_size, stats=file_stats, durability=durability)
+            run_stats.add_file(file_path, file_size, time.perf_counter() - start, outcome)
+            if progress:
+                file_stats.file_done(file_size)
+            return outcome, matched
+
+        for (file_path, _), (outcome, matched) in run_parallel(process, scanner, resolve_workers(workers)):
+            counts[outcome] += 1
+            if file_callback:
+                file_callback(file_path, outcome, selector.label(matched) if matched is not None else None)
+
+        durability.flush(run_stats)
+        return True, (f"重新加密完成! 成功: {counts['success']}, 失败: {counts['failed']}, "
+                      f"跳过: {counts['skipped']}")
+
     except Exception as e:
         return False, f"处理目录时出错: {str(e)}"
+    finally:
+        scanner.close()
+        durability.flush(run_stats)
+        if stats:
+            stats.finish()
+        if progress:
+            progress.notify()
+
+# --- Random Access ---
+
+class DecryptedReader(io.RawIOBase):
+    """
+    只读、可随机访问的解密文件对象，支持 read / readinto / seek / tell，可用 io.BufferedReader 包装。
+
+    CBC 模式下每个分组只依赖自身密文和前一个密文分组，因此读取任意位置时只需读取并解密覆盖该范围的
+    页（page_size 字节的密文，加上它前面的一个分组作为 IV）。最近解密的 cache_pages 个页保存在 LRU 缓存中。
+    打开时只解密最后一个分组来校验密码并确定明文长度，size 不包含 PKCS7 填充；从 100GB 文件中间读取 4KB
+    只需一次密钥派生和一次小读取。
+
+    file 可以是路径或可随机访问的二进制文件对象（由调用方负责关闭）。passwords 为候选密码列表时
+    自动选择能通过填充检查的密码。密码错误或文件不是加密文件时抛出 ValueError。不是线程安全的。
+    """
+
+    def __init__(self, file, password="123456", passwords=None, page_size=64 * 1024, cache_pages=64,
+                 stats=None):
+        super().__init__()
+        if page_size <= 0 or page_size % BLOCK_SIZE:
+            raise ValueError(f"page_size 必须是 {BLOCK_SIZE} 的正整数倍")
+        self.stats = stats or NO_STATS
+        self.page_size = page_size
+        self.cache_pages = max(1, cache_pages)
+        self._pages = OrderedDict()
+        self._pos = 0
+        if isinstance(file, (str, bytes, os.PathLike)):
+            self.name = os.fspath(file)
+            self._file = open(file, 'rb')
+            self._owns_file = True
+        else:
+            self.name = getattr(file, 'name', '')
+            self._file = file
+            self._owns_file = False
+        try:
+            self._fd = self._file.fileno() if hasattr(os, 'pread') else None
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            self._fd = None
+
+        try:
+            self._file_size = self._file.seek(0, os.SEEK_END)
+            selector = PasswordSelector(passwords if passwords else [password])
+            self.password, reason = selector.select_open(self._file, self._file_size, self.stats)
+            if self.password is None:
+                raise ValueError(reason)
+            self._file.seek(0)
+            header = self._file.read(HEADER_SIZE)
+            self._key = get_key(self.password, header[:SALT_SIZE], stats=self.stats)
+            self._payload_size = self._file_size - HEADER_SIZE
+            last_block = self._decrypt_range(self._payload_size - BLOCK_SIZE, self._payload_size)
+            self.size = self._payload_size - last_block[-1]
+        except BaseException:
+            if self._owns_file:
+                self._file.close()
+            raise
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_SET:
+            pos = offset
+        elif whence == os.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == os.SEEK_END:
+            pos = self.size + offset
+        else:
+            raise ValueError(f"无效的 whence: {whence}")
+        if pos < 0:
+            raise ValueError(f"无效的偏移: {pos}")
+        self._pos = pos
+        return pos
+
+    def readinto(self, b):
+        if self.closed:
+            raise ValueError("I/O operation on closed file.")
+        out = memoryview(b).cast('B')
+        total = 0
+        while total < len(out) and self._pos < self.size:
+            index, skip = divmod(self._pos, self.page_size)
+            page = self._page(index)
+            n = min(len(out) - total, len(page) - skip, self.size - self._pos)
+            out[total:total + n] = page[skip:skip + n]
+            total += n
+            self._pos += n
+        return total
+
+    def close(self):
+        if not self.closed and self._owns_file:
+            self._file.close()
+        self._pages.clear()
+        super().close()
+
+    def _page(self, index):
+        """返回第 index 页的明文（LRU 缓存）"""
+        page = self._pages.get(index)
+        if page is not None:
+            self._pages.move_to_end(index)
+            return page
+        start = index * self.page_size
+        page = self._decrypt_range(start, min(start + self.page_size, self._payload_size))
+        self._pages[index] = page
+        if len(self._pages) > self.cache_pages:
+            self._pages.popitem(last=False)
+        return page
+
+    def _decrypt_range(self, start, end):
+        """解密密文中 [start, end) 范围（按分组对齐）的数据，前一个密文分组（或文件头中的 IV）作为 IV 一并读取"""
+        offset = HEADER_SIZE + start - BLOCK_SIZE
+        length = end - start + BLOCK_SIZE
+        with self.stats.stage('read', length):
+            if self._fd is not None:
+                data = os.pread(self._fd, length, offset)
+            else:
+                self._file.seek(offset)
+                data = self._file.read(length)
+        if len(data) != length:
+            raise ValueError("文件在读取过程中被截断")
+        with self.stats.stage('aes', end - start):
+            return _cbc_decryptor(self._key, data[:BLOCK_SIZE]).decrypt(data[BLOCK_SIZE:])
+
+# --- HTTP Server ---
+
+SERVE_PAGE_SIZE = 256 * 1024        # 服务模式下 DecryptedReader 每页的字节数
+SERVE_CHUNK_SIZE = 256 * 1024       # 服务模式下每次写入套接字的字节数
+
+
+class DecryptServer(ThreadingHTTPServer):
+    """
+    本地 HTTP 服务：把加密目录树通过 HTTP 暴露出来，请求时即时解密，不写出任何明文文件。
+
+    每个连接在独立线程中处理，所有请求共享密码选择器和模块级的派生密钥缓存，同一文件重复请求时
+    不再派生密钥。支持 Range 请求（单个范围），播放器可以直接拖动进度；响应按块写入套接字，
+    客户端读取慢时写入阻塞，内存占用与文件大小无关。加密文件可以用去掉 .enc 后缀的名称访问
+    （同目录中已有该名称的文件时除外）。
+    """
+
+    daemon_threads = True
+
+    def __init__(self, server_address, directory_path, password="123456", passwords=None, classifier=None):
+        self.root = os.path.realpath(directory_path)
+        self.selector = PasswordSelector(passwords if passwords else [password])
+        self.classifier = classifier or DEFAULT_CLASSIFIER
+        super().__init__(server_address, _DecryptRequestHandler)
+
+    def resolve(self, url_path):
+        """把 URL 路径映射到目录树中的文件，返回绝对路径；越出根目录或不存在时返回 None"""
+        relative = unquote(urlsplit(url_path).path).lstrip('/')
+        path = os.path.realpath(os.path.join(self.root, relative))
+        if os.path.commonpath([self.root, path]) != self.root:
+            return None
+        if os.path.exists(path):
+            return path
+        if os.path.isfile(path + '.enc'):
+            return path + '.enc'
+        return None
+
+
+class _DecryptRequestHandler(BaseHTTPRequestHandler):
+    server_version = "BaiduDecrypt/1.0"
+
+    def do_HEAD(self):
+        self._handle(send_body=False)
+
+    def do_GET(self):
+        self._handle(send_body=True)
+
+    def _handle(self, send_body):
+        path = self.server.resolve(self.path)
+        if path is None:
+            self.send_error(404, explain="文件不存在")
+            return
+        if os.path.isdir(path):
+            self._send_listing(path, send_body)
+            return
+        try:
+            f, reader = self._open(path)
+        except ValueError:
+            self.send_error(403, explain="无法解密: 密码可能不正确或文件已损坏")
+            return
+        except OSError:
+            self.send_error(404, explain="无法打开文件")
+            return
+        with f, reader:
+            self._send_file(path, reader, send_body)
+
+    def log_message(self, format, *args):
+        # 核心库不直接产生控制台输出；BaseHTTPRequestHandler 默认把每个请求写到 stderr
+        pass
+
+    def _open(self, path):
+        """
+        返回 (文件对象, 读取对象)：加密文件的读取对象为 DecryptedReader，普通文件按原样读取。
+        大小符合加密格式但无法解密的文件，没有 .enc 后缀时视为普通文件按原样提供，有 .enc 后缀时抛出 ValueError。
+        """
+        f = open(path, 'rb')
+        try:
+            size = os.fstat(f.fileno()).st_size
+            if self.server.classifier.may_be_encrypted(path, size):
+                try:
+                    return f, DecryptedReader(f, passwords=self.server.selector.passwords,
+                                              page_size=SERVE_PAGE_SIZE, cache_pages=4)
+                except ValueError:
+                    if path.lower().endswith('.enc'):
+                        raise
+            f.seek(0)
+            return f, f
+        except BaseException:
+            f.close()
+            raise
+
+    def _send_file(self, path, reader, send_body):
+        size = reader.size if isinstance(reader, DecryptedReader) else os.fstat(reader.fileno()).st_size
+        byte_range = _parse_range(self.headers.get('Range'), size)
+        if byte_range is False:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{size}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        name = path[:-4] if path.lower().endswith('.enc') else path
+        start, end = byte_range or (0, size)
+        self.send_response(206 if byte_range else 200)
+        self.send_header("Content-Type", mimetypes.guess_type(name)[0] or "application/octet-stream")
+        self.send_header("Content-Length", str(end - start))
+        self.send_header("Accept-Ranges", "bytes")
+        if byte_range:
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{size}")
+        self.end_headers()
+        if not send_body:
+            return
+
+        reader.seek(start)
+        buf = memoryview(bytearray(SERVE_CHUNK_SIZE))
+        remaining = end - start
+        try:
+            while remaining:
+                n = reader.readinto(buf[:min(SERVE_CHUNK_SIZE, remaining)])
+                if not n:
+                    break
+                # 套接字写入阻塞即为背压：客户端读取多少，才继续解密多少
+                self.wfile.write(buf[:n])
+                remaining -= n
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _send_listing(self, path, send_body):
+        if not self.path.endswith('/'):
+            self.send_response(301)
+            self.send_header("Location", self.path + '/')
+            self.end_headers()
+            return
+        try:
+            entries = sorted(os.scandir(path), key=lambda e: (not e.is_dir(), e.name))
+        except OSError:
+            self.send_error(403, explain="无法读取目录")
+            return
+        names = {entry.name for entry in entries}
+        rows = []
+        for entry in entries:
+            name = entry.name + '/' if entry.is_dir() else entry.name
+            # 同目录中已有同名文件时保留 .enc 后缀，否则两者都显示为同一个名称，加密文件无法访问
+            if name.lower().endswith('.enc') and name[:-4] not in names:
+                name = name[:-4]
+            rows.append(f'<li><a href="{quote(name)}">{html.escape(name)}</a></li>')
+        title = html.escape(unquote(urlsplit(self.path).path))
+        body = (f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{title}</title></head>"
+                f"<body><h1>{title}</h1><ul>\n" + "\n".join(rows) + "\n</ul></body></html>\n").encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+
+def _parse_range(header, size):
+    """
+    解析 Range 请求头，返回 [start, end) 或 None（没有或不支持的 Range，返回整个文件）；
+    范围无法满足时返回 False
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, _, last = header[len('bytes='):].strip().partition('-')
+    try:
+        if not first:
+            length = int(last)
+            if length <= 0:
+                return False
+            return max(0, size - length), size
+        start = int(first)
+        end = int(last) + 1 if last else size
+    except ValueError:
+        return None
+    if start >= size or end <= start:
+        return False
+    return start, min(end, size)
+
+
+def serve_directory(directory_path, password="123456", passwords=None, host="127.0.0.1", port=8000,
+                    classifier=None):
+    """创建 DecryptServer（尚未开始处理请求），调用方通过 serve_forever() 运行、shutdown() 停止"""
+    if not os.path.isdir(directory_path):
+        raise ValueError(f"目录不存在: {directory_path}")
+    return DecryptServer((host, port), directory_path, password, passwords, classifier)
+
+# --- Asyncio API ---
+
+_async_executor = None
+_async_executor_lock = threading.Lock()
+
+def get_async_executor():
+    """返回异步接口共享的有界线程池（默认线程数为 CPU 核心数），首次调用时创建"""
+    global _async_executor
+    with _async_executor_lock:
+        if _async_executor is None:
+            _async_executor = ThreadPoolExecutor(max_workers=resolve_workers(0), thread_name_prefix="decrypt-async")
+        return _async_executor
+
+def configure_async_executor(max_workers=None):
+    """调整异步接口共享线程池的线程数（None 或 0 表示 CPU 核心数）；正在执行的任务不受影响"""
+    global _async_executor
+    with _async_executor_lock:
+        old, _async_executor = _async_executor, ThreadPoolExecutor(
+            max_workers=resolve_workers(max_workers), thread_name_prefix="decrypt-async")
+    if old is not None:
+        old.shutdown(wait=False)
+    return _async_executor
+
+async def decrypt_file_async(input_file_path, output_file_path=None, password="123456", executor=None, **options):
+    """
+    decrypt_file 的异步版本，返回 (是否成功, 信息)，options 同 decrypt_file。
+
+    密钥派生、AES 和文件 I/O 都在共享的有界线程池（或 executor）中执行，事件循环不会被阻塞；
+    同时发起的调用超过线程数时在线程池中排队，因此一个事件循环可以同时驱动大量解密而不会无限制地占用线程。
+    调用方取消时，已经开始的解密仍会在后台完成。
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor or get_async_executor(), functools.partial(
+        decrypt_file, input_file_path, output_file_path, password, **options))
+
+def iter_decrypt_directory(directory_path, password="123456", executor=None, queue_size=256, **options):
+    """
+    异步逐个获取目录中每个文件的处理结果：
+
+        async with iter_decrypt_directory(path, workers=8) as results:
+            async for file_path, outcome, label in results:
+                ...
+        print(results.success, results.message)
+
+    options 同 decrypt_directory（file_callback 除外）。每个文件在共享的有界线程池（或 executor）中处理，
+    同时处理 workers 个（默认为 CPU 核心数）；结果通过长度为 queue_size 的队列交给事件循环，消费方处理不过来时解密会暂停。
+    progress_callback 等回调在后台线程中调用。提前结束迭代时应使用 async with 或调用 close()。
+    """
+    return AsyncDirectoryResults(directory_path, password, executor, queue_size, options)
+
+async def decrypt_directory_async(directory_path, password="123456", file_callback=None, executor=None, **options):
+    """decrypt_directory 的异步版本，返回 (是否成功, 信息)；file_callback 在事件循环中调用"""
+    async with iter_decrypt_directory(directory_path, password, executor, **options) as results:
+        async for file_path, outcome, label in results:
+            if file_callback:
+                file_callback(file_path, outcome, label)
+    return results.success, results.message
+
+
+class _ResultsClosed(Exception):
+    pass
+
+
+class AsyncDirectoryResults:
+    """iter_decrypt_directory 返回的异步迭代器，迭代结束后 success / message 为整个目录的处理结果"""
+
+    _DONE = object()
+
+    def __init__(self, directory_path, password, executor, queue_size, options):
+        self.success = None
+        self.message = None
+        self._args = (directory_path, password)
+        self._options = dict(options, executor=executor or get_async_executor())
+        self._options.setdefault('workers', 0)
+        self._queue_size = queue_size
+        self._queue = None
+        self._loop = None
+        self._finished = False
+        self._closed = threading.Event()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._queue is None:
+            self._start()
+        if self._finished:
+            raise StopAsyncIteration
+        item = await self._queue.get()
+        if item is self._DONE:
+            self._finished = True
+            raise StopAsyncIteration
+        return item
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.close()
+        return False
+
+    def close(self):
+        """停止处理：正在处理的文件完成后不再提交新文件"""
+        self._closed.set()
+
+    def _start(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self._queue_size)
+        # 驱动线程只负责调度和汇总，文件处理在共享线程池中进行；不占用线程池，避免线程数为 1 时互相等待
+        threading.Thread(target=self._drive, name="decrypt-async-driver", daemon=True).start()
+
+    def _put(self, item):
+        # 队列满时阻塞驱动线程（背压），同时响应 close()
+        future = asyncio.run_coroutine_threadsafe(self._queue.put(item), self._loop)
+        while True:
+            try:
+                return future.result(timeout=0.1)
+            except FutureTimeoutError:
+                if self._closed.is_set() or self._loop.is_closed():
+                    future.cancel()
+                    raise _ResultsClosed()
+
+    def _drive(self):
+        def on_file(file_path, outcome, label):
+            self._put((file_path, outcome, label))
+
+        try:
+            success, message = decrypt_directory(*self._args, file_callback=on_file, **self._options)
+        except Exception as e:
+            success, message = False, f"处理目录时出错: {str(e)}"
+        if self._closed.is_set():
+            success, message = False, "处理已取消"
+        self.success, self.message = success, message
+        try:
+            self._put(self._DONE)
+        except (_ResultsClosed, RuntimeError):
+            pass
 
 # --- Command-Line Interface (CLI) Specific Code ---
 
@@ -153,27 +3032,102 @@ def main_cli():
         print("错误: 缺少 'tqdm' 库。请运行: pip install tqdm")
         sys.exit(1)
         
-    try:
-        from Crypto.Cipher import AES
-        from Crypto.Util.Padding import unpad
-    except ImportError:
-        print("错误: 缺少 'pycryptodome' 库。请运行: pip install pycryptodome")
-        sys.exit(1)
-
     parser = argparse.ArgumentParser(description="百度网盘加密文件解密工具")
     group = parser.add_mutually_exclusive_group(required=True)
-    group.add_argument("-f", "--file", help="要解密的单个文件路径")
+    group.add_argument("-f", "--file", help="要解密的单个文件路径，- 表示从标准输入读取")
     group.add_argument("-d", "--directory", help="包含加密文件的目录路径")
     
-    parser.add_argument("-p", "--password", default="123456", help="解密密码，默认为123456")
-    parser.add_argument("-o", "--output", help="输出路径（单个文件时为输出文件路径，目录时为输出目录路径）")
+    parser.add_argument("-p", "--password", help="解密密码，默认为123456")
+    parser.add_argument("--password-file", help="候选密码文件，每行一个；每个文件自动选择匹配的密码")
+    parser.add_argument("-o", "--output", help="输出路径（单个文件时为输出文件路径，- 表示写到标准输出；目录时为输出目录路径）")
     parser.add_argument("-r", "--recursive", action="store_true", help="递归处理子目录")
     parser.add_argument("-k", "--keep", action="store_true", help="保留原始加密文件")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="并行任务数（目录为同时处理的文件数，单个大文件为并行解密的线程数），0 表示使用全部CPU核心，默认为1")
+    parser.add_argument("--suffix", action="append", help="只把这些扩展名的文件视为加密文件（可重复指定，如 --suffix .enc）")
+    parser.add_argument("--hardlink", action="store_true",
+                        help="保留原始文件时，普通文件以硬链接方式放入输出目录（与原文件共享数据）")
+    parser.add_argument("--durability", choices=Durability.MODES, default="none",
+                        help="输出持久化策略: none 不调用 fsync（默认）, file 每个文件 fsync, batch 按批同步")
+    parser.add_argument("--sync-every", type=int, default=1000, help="batch 模式下每处理多少个文件同步一次，默认为1000")
+    parser.add_argument("--sync-interval", type=float, default=5.0, help="batch 模式下最长同步间隔（秒），默认为5")
+    parser.add_argument("--journal", help="目录模式下把每个处理完的文件记录到该进度日志 (SQLite)")
+    parser.add_argument("--resume", action="store_true", help="根据 --journal 指定的进度日志续传，跳过已完成的文件")
+    parser.add_argument("--progress", choices=["bytes", "files"], default="bytes",
+                        help="进度条按字节（默认，ETA 更准确）或按文件数计算")
+    parser.add_argument("--verify", action="store_true", help="只校验加密文件能否用该密码解密，不写出任何明文")
+    parser.add_argument("--report", help="校验模式下将逐文件结果写入该 JSON 报告文件")
+    parser.add_argument("--stats", help="将各阶段耗时、字节数、文件大小分布等统计写入该 JSON 文件（- 表示输出到终端）")
+    parser.add_argument("--new-password", help="更换密码：用新密码原地重新加密文件（-p / --password-file 为旧密码），不产生明文文件")
+    parser.add_argument("--watch", action="store_true", help="持续监视目录（需配合 -d），新文件写完后立即解密，按 Ctrl+C 停止")
+    parser.add_argument("--settle", type=float, default=1.0, help="监视模式下文件大小保持不变多少秒后视为写完，默认为1")
+    parser.add_argument("--poll-interval", type=float, default=2.0, help="监视模式在不支持 inotify 时的轮询间隔（秒），默认为2")
+    parser.add_argument("--serve", action="store_true", help="以本地 HTTP 服务的方式提供目录中的文件，请求时即时解密（需配合 -d）")
+    parser.add_argument("--host", default="127.0.0.1", help="服务模式监听的地址，默认为127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000, help="服务模式监听的端口，默认为8000")
+    parser.add_argument("--keystore", help=f"持久化派生密钥库路径，重复处理同一文件时跳过密钥派生（库密钥可通过环境变量 {KEYSTORE_SECRET_ENV} 指定）")
+    parser.add_argument("--backend", choices=["auto"] + list(BACKENDS),
+                        help=f"AES / PBKDF2 加密后端，默认取环境变量 {BACKEND_ENV}，未设置时自动选择最快的可用后端")
     
     args = parser.parse_args()
+    explicit_password = args.password is not None
+    if not explicit_password:
+        args.password = "123456"
+
+    try:
+        if args.backend:
+            set_backend(args.backend)
+        backend = get_backend()
+    except ValueError as e:
+        print(f"错误: {str(e)}")
+        sys.exit(1)
+    if backend.name == 'pure':
+        print("⚠️ 正在使用纯 Python 加密后端，速度很慢。建议运行: pip install pycryptodome")
+    
+    if args.keystore:
+        if 'AES' not in globals():
+            print("错误: 持久化密钥库需要 'pycryptodome' 库。请运行: pip install pycryptodome")
+            sys.exit(1)
+        configure_key_cache(keystore_path=args.keystore)
+    
+    passwords = None
+    if args.password_file:
+        passwords = load_password_file(args.password_file)
+        if not passwords:
+            print(f"错误: 密码文件中没有密码: {args.password_file}")
+            sys.exit(1)
+        if explicit_password and args.password not in passwords:
+            passwords.insert(0, args.password)
+    
+    if args.verify:
+        sys.exit(run_verify_cli(args, passwords, tqdm))
+    
+    if args.serve:
+        sys.exit(run_serve_cli(args, passwords))
+    
+    stats = RunStats() if args.stats else None
+    durability = Durability(args.durability, args.sync_every, args.sync_interval)
+    
+    if args.watch:
+        sys.exit(run_watch_cli(args, passwords, durability))
+    
+    if args.new_password is not None:
+        sys.exit(run_rekey_cli(args, passwords, stats, durability, tqdm))
+    
+    if args.file and (args.file == '-' or args.output == '-'):
+        sys.exit(run_pipe_cli(args, passwords, stats, durability))
     
     if args.file:
-        success, message = decrypt_file(args.file, args.output, args.password, args.keep)
+        input_size = os.path.getsize(args.file) if stats and os.path.isfile(args.file) else 0
+        start = time.perf_counter()
+        with tqdm(total=0, unit="B", unit_scale=True, unit_divisor=1024, desc="解密进度", leave=False) as pbar:
+            progress = BatchProgress(callback=_tqdm_progress_updater(pbar, None))
+            success, message = decrypt_file(args.file, args.output, args.password, args.keep, passwords=passwords,
+                                            stats=stats, progress=progress, durability=durability,
+                                            workers=resolve_workers(args.jobs))
+        if stats:
+            stats.add_file(args.file, input_size, time.perf_counter() - start, 'success' if success else 'failed')
+            stats.finish()
         if success:
             output_path = args.output or (args.file[:-4] if args.file.lower().endswith('.enc') else f"{args.file}.dec")
             print(f"✅ 文件解密成功: {output_path}")
@@ -189,51 +3143,258 @@ def main_cli():
             print(f"错误: 目录不存在: {args.directory}")
             sys.exit(1)
         
-        if args.recursive:
-            all_files = [str(p) for p in Path(args.directory).rglob('*') if p.is_file()]
+        if args.resume and not args.journal:
+            print("错误: --resume 需要配合 --journal 指定进度日志")
+            sys.exit(1)
+        
+        workers = resolve_workers(args.jobs)
+        if workers > 1:
+            print(f"并行任务数: {workers}")
+        
+        multiple_passwords = passwords is not None and len(passwords) > 1
+        
+        if args.progress == 'bytes':
+            pbar = tqdm(total=0, unit="B", unit_scale=True, unit_divisor=1024, desc="处理进度")
         else:
-            all_files = [str(p) for p in Path(args.directory).glob('*') if p.is_file()]
+            pbar = tqdm(total=0, desc="处理进度")
         
-        decrypt_success_count = 0
-        decrypt_failed_count = 0
-        copy_count = 0
-        skipped_count = 0
-
-        with tqdm(all_files, desc="处理进度") as pbar:
-            for file_path in pbar:
-                pbar.set_description(f"处理: {os.path.basename(file_path)}")
-                
-                rel_path = os.path.relpath(file_path, args.directory)
-                
-                if args.output:
-                    target_path = os.path.join(args.output, rel_path)
-                    os.makedirs(os.path.dirname(target_path), exist_ok=True)
-                    
-                    if is_encrypted_file(file_path):
-                        success, _ = decrypt_file(file_path, target_path, args.password, args.keep)
-                        if success:
-                            decrypt_success_count += 1
-                        else:
-                            decrypt_failed_count += 1
-                    else:
-                        import shutil
-                        shutil.copy2(file_path, target_path)
-                        copy_count += 1
-                        if not args.keep:
-                            os.remove(file_path)
-                else:
-                    if is_encrypted_file(file_path):
-                        success, _ = decrypt_file(file_path, None, args.password, args.keep)
-                        if success:
-                            decrypt_success_count += 1
-                        else:
-                            decrypt_failed_count += 1
-                    else:
-                        skipped_count += 1
+        def on_file(file_path, outcome, label):
+            if label and multiple_passwords:
+                pbar.write(f"🔑 {file_path}: 密码 {label}")
+            pbar.set_description(f"处理: {os.path.basename(file_path)}", refresh=False)
+        
+        if args.progress == 'bytes':
+            progress = BatchProgress(callback=_tqdm_progress_updater(pbar, lambda: progress.scan_finished))
+            progress_callback = None
+        else:
+            progress = None
+
+            def progress_callback(done, total):
+                pbar.total = total
+                pbar.n = done
+                pbar.refresh()
+        
+        with pbar:
+            success, message = decrypt_directory(
+                args.directory, args.password, args.recursive, args.keep, args.output,
+                progress_callback=progress_callback, workers=workers, passwords=passwords, file_callback=on_file,
+                classifier=FileClassifier(encrypted_suffixes=args.suffix), stats=stats, progress=progress,
+                hardlink=args.hardlink, durability=durability, journal=args.journal, resume=args.resume
+            )
         
-        message = (f"处理完成! 成功: {decrypt_success_count}, 失败: {decrypt_failed_count}, "
-                   f"复制: {copy_count}, 跳过: {skipped_count}")
         print(f"\n{message}")
+        
+        if args.keystore:
+            cache_stats = get_key_cache().stats()
+            print(f"密钥缓存: 命中 {cache_stats['hits']}, 密钥库命中 {cache_stats['keystore_hits']}, "
+                  f"未命中 {cache_stats['misses']}")
+        if not success:
+            sys.exit(1)
+    
+    if stats:
+        dump_stats(stats, args.stats)
+
+def dump_stats(stats, path, stream=None):
+    """将运行统计（附带密钥缓存命中情况）以 JSON 写入文件，path 为 - 时输出到终端（stream，默认为标准输出）"""
+    data = stats.to_dict()
+    data['key_cache'] = get_key_cache().stats()
+    text = json.dumps(data, ensure_ascii=False, indent=2)
+    if path == '-':
+        print(text, file=stream)
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        print(f"统计信息已写入: {path}", file=stream)
+
+def _tqdm_progress_updater(pbar, scan_finished):
+    """返回一个 BatchProgress 回调，把字节进度同步到 tqdm 进度条，文件数显示在后缀中"""
+    def update(bytes_done, bytes_total, files_done, files_total):
+        pbar.total = bytes_total
+        pbar.n = bytes_done
+        if scan_finished is not None:
+            suffix = "" if scan_finished() else "+"
+            pbar.set_postfix_str(f"文件 {files_done}/{files_total}{suffix}", refresh=False)
+        pbar.refresh()
+    return update
+
+def _update_scan_total(pbar, scanner):
+    """扫描完成前进度条的总数显示为"目前已发现"的文件数"""
+    if pbar.total != scanner.discovered:
+        pbar.total = scanner.discovered
+    pbar.set_postfix_str("" if scanner.finished else "扫描中...", refresh=False)
+
+def run_verify_cli(args, passwords, tqdm):
+    """
+    --verify 模式：校验文件并打印未通过的文件，返回进程退出码（全部通过时为0）。
+    目录模式下按 --suffix 和文件头判断为普通文件的文件计为跳过，不影响退出码。
+    """
+    selector = PasswordSelector(passwords if passwords else [args.password])
+    if args.file:
+        scanner = None
+        classifier = None
+        items = [(args.file, None)]
+    elif os.path.isdir(args.directory):
+        scanner = DirectoryScanner(args.directory, args.recursive)
+        classifier = FileClassifier(encrypted_suffixes=args.suffix)
+        items = scanner
+    else:
+        print(f"错误: 目录不存在: {args.directory}")
+        return 1
+    
+    def check(item):
+        return _audit_file(item[0], selector, classifier, item[1])
+    
+    results = []
+    skipped_count = 0
+    with tqdm(total=1 if scanner is None else 0, desc="校验进度") as pbar:
+        for (file_path, _), (outcome, reason, _) in run_parallel(check, items, resolve_workers(args.jobs)):
+            if outcome == 'skipped':
+                skipped_count += 1
+            else:
+                results.append((file_path, outcome == 'passed', reason))
+                if outcome == 'failed':
+                    pbar.write(f"❌ {file_path}: {reason}")
+            if scanner is not None:
+                _update_scan_total(pbar, scanner)
+            pbar.update(1)
+    
+    failed_count = sum(1 for _, ok, _ in results if not ok)
+    print(f"\n校验完成! 通过: {len(results) - failed_count}, 未通过: {failed_count}, 跳过: {skipped_count}")
+    
+    if args.report:
+        report = [{'path': path, 'ok': ok, 'reason': reason} for path, ok, reason in sorted(results)]
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"校验报告已写入: {args.report}")
+    
+    return 1 if failed_count else 0
+
+def run_pipe_cli(args, passwords, stats, durability):
+    """
+    -f - / -o - 模式：在标准输入 / 标准输出之间流式解密，不产生临时文件，返回进程退出码。
+    明文写到标准输出时，提示信息和统计输出到标准错误，且不删除原始文件。
+    """
+    messages = sys.stderr if args.output == '-' else sys.stdout
+    if args.output != '-' and not args.output:
+        print("错误: 从标准输入读取时需要用 -o 指定输出文件（- 表示标准输出）", file=messages)
+        return 1
+    
+    temp_path = None
+    start = time.perf_counter()
+    try:
+        src = sys.stdin.buffer if args.file == '-' else open(args.file, 'rb')
+        with src:
+            if args.output == '-':
+                written = decrypt_pipe(src, sys.stdout.buffer, args.password, passwords, stats=stats or NO_STATS)
+            else:
+                _ensure_dir(os.path.dirname(args.output))
+                dst, temp_path = _open_temp_output(args.output)
+                with dst:
+                    written = decrypt_pipe(src, dst, args.password, passwords, stats=stats or NO_STATS)
+                    durability.file_written(dst, stats or NO_STATS)
+                os.replace(temp_path, args.output)
+                temp_path = None
+                durability.committed(args.output, stats=stats or NO_STATS)
+                durability.flush(stats or NO_STATS)
+    except BrokenPipeError:
+        # 下游提前退出（如 head）：把标准输出指向 /dev/null，避免解释器退出时刷新缓冲区再次报错
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except ValueError as e:
+        print(f"❌ 解密失败: {str(e)}", file=messages)
+        return 1
+    except OSError as e:
+        print(f"❌ {str(e)}", file=messages)
+        return 1
+    finally:
+        if temp_path:
+            _remove_quietly(temp_path)
+    
+    if args.output != '-':
+        print(f"✅ 文件解密成功: {args.output}", file=messages)
+    if stats:
+        stats.add_file(args.file, written, time.perf_counter() - start, 'success')
+        stats.finish()
+        dump_stats(stats, args.stats, messages)
+    return 0
+
+def run_rekey_cli(args, passwords, stats, durability, tqdm):
+    """--new-password 模式：原地（或单个文件时写到 -o）用新密码重新加密，返回进程退出码"""
+    if not args.new_password:
+        print("错误: 新密码不能为空")
+        return 1
+    
+    if args.file:
+        success, message = rekey_file(args.file, args.password, args.new_password, args.output, passwords,
+                                      stats=stats, durability=durability)
+        if stats:
+            stats.finish()
+        print(f"{'✅' if success else '❌'} {message}: {args.output or args.file}")
+    else:
+        print(f"开始更换目录中文件的密码: {args.directory} {'(递归)' if args.recursive else ''}")
+        with tqdm(total=0, unit="B", unit_scale=True, unit_divisor=1024, desc="处理进度") as pbar:
+            progress = BatchProgress(callback=_tqdm_progress_updater(pbar, lambda: progress.scan_finished))
+            
+            def on_file(file_path, outcome, label):
+                if outcome == 'failed':
+                    pbar.write(f"❌ {file_path}")
+            
+            success, message = rekey_directory(
+                args.directory, args.password, args.new_password, args.recursive, args.jobs, passwords,
+                file_callback=on_file, classifier=FileClassifier(encrypted_suffixes=args.suffix), stats=stats,
+                progress=progress, durability=durability
+            )
+        print(f"\n{message}")
+    
+    if stats:
+        dump_stats(stats, args.stats)
+    return 0 if success else 1
+
+def run_watch_cli(args, passwords, durability):
+    """--watch 模式：在前台监视目录并逐个报告解密结果，Ctrl+C 停止后打印汇总，返回进程退出码"""
+    if not args.directory:
+        print("错误: 监视模式需要使用 -d 指定目录")
+        return 1
+    
+    icons = {'success': '✅', 'failed': '❌', 'copied': '📄', 'skipped': '⏭'}
+    
+    def on_ready(watcher):
+        mode = "inotify" if watcher.backend == 'inotify' else f"轮询，每 {args.poll_interval} 秒"
+        print(f"正在监视目录: {args.directory} ({mode})  (按 Ctrl+C 停止)")
+    
+    def on_file(file_path, outcome, label):
+        suffix = f" (密码 {label})" if label and passwords and len(passwords) > 1 else ""
+        print(f"{icons[outcome]} {file_path}{suffix}", flush=True)
+    
+    success, message = watch_directory(
+        args.directory, args.password, args.recursive, args.keep, args.output, workers=args.jobs,
+        passwords=passwords, file_callback=on_file, classifier=FileClassifier(encrypted_suffixes=args.suffix),
+        hardlink=args.hardlink, durability=durability, settle_seconds=args.settle,
+        poll_interval=args.poll_interval, ready_callback=on_ready
+    )
+    print(f"\n{message}")
+    return 0 if success else 1
+
+def run_serve_cli(args, passwords):
+    """--serve 模式：在前台运行 HTTP 服务直到 Ctrl+C，返回进程退出码"""
+    if not args.directory:
+        print("错误: 服务模式需要使用 -d 指定目录")
+        return 1
+    try:
+        server = serve_directory(args.directory, args.password, passwords, args.host, args.port,
+                                 FileClassifier(encrypted_suffixes=args.suffix))
+    except (ValueError, OSError) as e:
+        print(f"错误: {str(e)}")
+        return 1
+    host, port = server.server_address[:2]
+    print(f"正在提供目录: {args.directory}")
+    print(f"访问地址: http://{host}:{port}/  (按 Ctrl+C 停止)")
+    with server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print("\n服务已停止")
+    return 0
 
 if __name__ == "__main__":
     try:
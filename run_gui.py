@@ -29,7 +29,15 @@ except ImportError:
     print("提示: 安装 customtkinter 可获得更好的界面效果: pip install customtkinter")
 
 # 导入我们的解密模块
-from decrypt import decrypt_file, decrypt_directory, is_encrypted_file
+from decrypt import (decrypt_file, decrypt_directory, is_encrypted_file, resolve_workers,
+                     BatchProgress, format_size, format_duration)
+
+# 批量解密默认使用全部CPU核心
+DEFAULT_WORKERS = resolve_workers(0)
+WORKER_CHOICES = sorted({"1", "2", "4", "8", "16", str(DEFAULT_WORKERS)}, key=int)
+
+# 批量解密时界面刷新进度的间隔（毫秒）
+PROGRESS_POLL_MS = 200
 
 
 class ModernDecryptGUI:
@@ -51,7 +59,7 @@ class ModernDecryptGUI:
     def setup_modern_ui(self):
         """设置现代化UI（使用customtkinter）"""
         self.root.title("百度网盘解密工具")
-        self.root.geometry("580x480")
+        self.root.geometry("580x520")
         self.root.resizable(True, True)
         
         # 主容器
@@ -127,7 +135,7 @@ class ModernDecryptGUI:
     def setup_classic_ui(self):
         """设置经典UI（使用tkinter）"""
         self.root.title("百度网盘解密工具")
-        self.root.geometry("580x480")
+        self.root.geometry("580x520")
         self.root.resizable(False, False)
         self.root.configure(bg='white')
         
@@ -524,12 +532,27 @@ class ModernDecryptGUI:
             variable=self.batch_keep_original_var
         ).pack(anchor="w")
         
+        workers_frame = ctk.CTkFrame(options_frame, fg_color="transparent")
+        workers_frame.pack(anchor="w", pady=(3, 0))
+        ctk.CTkLabel(workers_frame, text="并行任务数:").pack(side="left", padx=(0, 6))
+        self.workers_var = tk.StringVar(value=str(DEFAULT_WORKERS))
+        ctk.CTkOptionMenu(
+            workers_frame,
+            variable=self.workers_var,
+            values=WORKER_CHOICES,
+            width=70,
+            height=24
+        ).pack(side="left")
+        
         # 进度条
         self.progress_var = tk.DoubleVar()
         self.progress_bar = ctk.CTkProgressBar(parent)
-        self.progress_bar.pack(fill="x", padx=12, pady=6)
+        self.progress_bar.pack(fill="x", padx=12, pady=(6, 0))
         self.progress_bar.set(0)
         
+        self.batch_progress_label = ctk.CTkLabel(parent, text="", font=ctk.CTkFont(size=10))
+        self.batch_progress_label.pack(fill="x", padx=12)
+        
         # 解密按钮
         decrypt_button = ctk.CTkButton(
             parent,
@@ -638,10 +661,26 @@ class ModernDecryptGUI:
             font=("Microsoft YaHei", 10)
         ).pack(anchor="w")
         
+        workers_frame = tk.Frame(options_frame, bg='white')
+        workers_frame.pack(anchor="w")
+        tk.Label(workers_frame, text="并行任务数:", font=("Microsoft YaHei", 10), bg='white').pack(side="left", padx=(0, 8))
+        self.workers_var = tk.StringVar(value=str(DEFAULT_WORKERS))
+        tk.Spinbox(
+            workers_frame,
+            from_=1,
+            to=max(64, DEFAULT_WORKERS),
+            textvariable=self.workers_var,
+            width=5,
+            font=("Microsoft YaHei", 10)
+        ).pack(side="left")
+        
         # 进度条
         self.progress_var = tk.DoubleVar()
         self.progress_bar = ttk.Progressbar(parent, variable=self.progress_var)
-        self.progress_bar.pack(fill="x", padx=20, pady=10)
+        self.progress_bar.pack(fill="x", padx=20, pady=(10, 0))
+        
+        self.batch_progress_label = tk.Label(parent, text="", font=("Microsoft YaHei", 9), bg='white', fg='#666666')
+        self.batch_progress_label.pack(fill="x", padx=20)
         
         # 解密按钮
         decrypt_button = tk.Button(
@@ -800,6 +839,12 @@ class ModernDecryptGUI:
             recursive = self.recursive_var.get()
             keep_original = self.batch_keep_original_var.get()
             
+            try:
+                workers = resolve_workers(int(self.workers_var.get()))
+            except ValueError:
+                self.show_error("错误", "并行任务数必须是整数")
+                return
+            
             if not input_dir:
                 self.show_error("错误", "请选择输入目录")
                 return
@@ -825,12 +870,19 @@ class ModernDecryptGUI:
             else:
                 self.progress_var.set(0)
             
+            # 工作线程只更新 progress，界面按固定间隔读取快照，不会因文件数量多而堆积事件
+            progress = BatchProgress()
+            finished = threading.Event()
+            self.poll_batch_progress(progress, finished)
+            
             def decrypt_batch_thread():
                 try:
                     output_path = output_dir if output_dir else None
                     success, message = decrypt_directory(
-                        input_dir, password, recursive, keep_original, output_path
+                        input_dir, password, recursive, keep_original, output_path, workers=workers,
+                        progress=progress
                     )
+                    finished.set()
                     
                     if HAS_CUSTOMTKINTER:
                         self.root.after(0, lambda: self.progress_bar.set(1.0))
@@ -845,6 +897,7 @@ class ModernDecryptGUI:
                         self.root.after(0, lambda: self.show_error("失败", message))
                     
                 except Exception as e:
+                    finished.set()
                     error_info = traceback.format_exc()
                     self.root.after(0, lambda: self.update_status("批量解密出错"))
                     self.root.after(0, lambda: self.show_error("错误", f"批量解密过程中出错:\n{str(e)}\n\n详细信息:\n{error_info}"))
@@ -855,6 +908,35 @@ class ModernDecryptGUI:
             self.update_status("出现意外错误")
             self.show_error("程序错误", f"在启动批量解密时发生未知错误:\n\n{str(e)}\n\n详细信息:\n{error_info}")
     
+    def poll_batch_progress(self, progress, finished):
+        """定时读取批量解密进度并刷新进度条和进度信息（在主线程中运行）"""
+        self.show_batch_progress(progress.snapshot())
+        if not finished.is_set():
+            self.root.after(PROGRESS_POLL_MS, lambda: self.poll_batch_progress(progress, finished))
+    
+    def show_batch_progress(self, snapshot):
+        """显示一次进度快照：文件数、数据量、速度和预计剩余时间"""
+        if snapshot['scan_finished'] and snapshot['files_done'] >= snapshot['files_total']:
+            fraction = 1.0
+        elif snapshot['bytes_total']:
+            fraction = snapshot['bytes_done'] / snapshot['bytes_total']
+        elif snapshot['files_total']:
+            fraction = snapshot['files_done'] / snapshot['files_total']
+        else:
+            fraction = 0
+        if HAS_CUSTOMTKINTER:
+            self.progress_bar.set(fraction)
+        else:
+            self.progress_var.set(fraction * 100)
+        
+        files_total = f"{snapshot['files_total']}" if snapshot['scan_finished'] else f"{snapshot['files_total']}+"
+        eta = format_duration(snapshot['eta']) if snapshot['eta'] is not None else "--:--:--"
+        self.batch_progress_label.configure(
+            text=(f"文件 {snapshot['files_done']}/{files_total}  "
+                  f"数据 {format_size(snapshot['bytes_done'])}/{format_size(snapshot['bytes_total'])}  "
+                  f"{format_size(snapshot['bytes_per_second'])}/s  剩余 {eta}")
+        )
+    
     def on_closing(self):
         """窗口关闭事件处理"""
         self.root.quit()
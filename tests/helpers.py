@@ -0,0 +1,43 @@
+"""测试用的加密文件构造工具"""
+
+import random
+
+import decrypt
+
+
+def random_bytes(size, seed=0):
+    """固定种子的伪随机数据：测试中的密文（包括错误密码是否恰好通过填充检查）每次运行都相同"""
+    return random.Random(f"{seed}:{size}").randbytes(size)
+
+
+def encrypt(plaintext, password="123456", seed=0, salt=None):
+    """按 decrypt.py 的文件格式加密明文: salt(16) + IV(16) + AES-256-CBC 密文 (PKCS7 填充)"""
+    rng = random.Random(seed)
+    salt = salt or rng.randbytes(decrypt.SALT_SIZE)
+    iv = rng.randbytes(decrypt.IV_SIZE)
+    key = decrypt.get_key(password, salt)
+    pad_len = decrypt.BLOCK_SIZE - len(plaintext) % decrypt.BLOCK_SIZE
+    padded = bytes(plaintext) + bytes([pad_len]) * pad_len
+    return salt + iv + decrypt._cbc_encryptor(key, iv).encrypt(padded)
+
+
+def colliding_file(right, wrong, seed=0, salt=None):
+    """
+    构造一个用 right 加密、但用 wrong 解密最后一个分组时也得到合法填充的文件（只有一个密文分组），
+    返回 (文件内容, 用 right 解密得到的明文)。真实文件中错误密码约有 1/256 的概率出现这种情况。
+    """
+    rng = random.Random(seed)
+    salt = salt or rng.randbytes(decrypt.SALT_SIZE)
+    right_key = decrypt.get_key(right, salt)
+    wrong_key = decrypt.get_key(wrong, salt)
+    zero_iv = bytes(decrypt.IV_SIZE)
+    while True:
+        block = rng.randbytes(decrypt.BLOCK_SIZE)
+        right_out = decrypt._cbc_decryptor(right_key, zero_iv).decrypt(block)
+        wrong_out = decrypt._cbc_decryptor(wrong_key, zero_iv).decrypt(block)
+        if right_out[-1] == wrong_out[-1]:
+            break
+    # 选择 IV 使 right 解密得到 15 字节明文 + 填充 0x01；wrong 解密的最后一个字节随之也是 0x01
+    plaintext = rng.randbytes(decrypt.BLOCK_SIZE - 1)
+    iv = bytes(x ^ y for x, y in zip(right_out, plaintext + b'\x01'))
+    return salt + iv + block, plaintext
@@ -0,0 +1,41 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import decrypt
+from helpers import encrypt, random_bytes
+
+DECRYPT_PY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "decrypt.py")
+
+
+@pytest.fixture
+def archive(tmp_path):
+    data = encrypt(random_bytes(1000))
+    (tmp_path / "good.enc").write_bytes(data)
+    (tmp_path / "truncated.enc").write_bytes(data[:-5])
+    (tmp_path / "stub.enc").write_bytes(data[:40])
+    (tmp_path / "readme.txt").write_bytes(b"hello")
+    return tmp_path
+
+
+@pytest.mark.parametrize("suffixes", [None, [".enc"]])
+def test_truncated_encrypted_files_fail_the_audit(archive, suffixes):
+    ok, message, results = decrypt.audit_directory(str(archive),
+                                                   classifier=decrypt.FileClassifier(encrypted_suffixes=suffixes))
+
+    assert ok
+    assert message == "校验完成! 通过: 1, 未通过: 2, 跳过: 1"
+    reasons = {os.path.basename(path): (passed, reason) for path, passed, reason in results}
+    assert reasons["good.enc"][0]
+    assert reasons["truncated.enc"] == (False, f"密文长度不是{decrypt.BLOCK_SIZE}的整数倍")
+    assert reasons["stub.enc"] == (False, "文件过小，缺少文件头或密文")
+
+
+def test_verify_cli_exits_nonzero_on_truncation(archive):
+    result = subprocess.run([sys.executable, DECRYPT_PY, "-d", str(archive), "--verify", "--suffix", ".enc"],
+                            capture_output=True, text=True, encoding="utf-8")
+
+    assert result.returncode == 1
+    assert "通过: 1, 未通过: 2, 跳过: 1" in result.stdout
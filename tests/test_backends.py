@@ -0,0 +1,92 @@
+import hashlib
+
+import pytest
+
+import decrypt
+
+# NIST SP 800-38A, F.2.5 / F.2.6 (CBC-AES256)
+KEY = bytes.fromhex("603deb1015ca71be2b73aef0857d77811f352c073b6108d72d9810a30914dff4")
+IV = bytes.fromhex("000102030405060708090a0b0c0d0e0f")
+PLAINTEXT = bytes.fromhex(
+    "6bc1bee22e409f96e93d7e117393172a"
+    "ae2d8a571e03ac9c9eb76fac45af8e51"
+    "30c81c46a35ce411e5fbc1191a0a52ef"
+    "f69f2445df4f9b17ad2b417be66c3710"
+)
+CIPHERTEXT = bytes.fromhex(
+    "f58c4c04d6e5f1ba779eabfb5f7bfbd6"
+    "9cfc4e967edb808d679f777bc6702c7d"
+    "39f23369a9d9bacfa530e26304231461"
+    "b2eb05e2c39be9fcda6c19078c6a9d1b"
+)
+
+BACKENDS = decrypt.available_backends()
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request):
+    return decrypt.BACKENDS[request.param]()
+
+
+def test_pure_backend_always_available():
+    assert "pure" in BACKENDS
+
+
+def test_cbc_encrypt_known_answer(backend):
+    assert bytes(backend.cbc_encryptor(KEY, IV).encrypt(PLAINTEXT)) == CIPHERTEXT
+
+
+def test_cbc_decrypt_known_answer(backend):
+    assert bytes(backend.cbc_decryptor(KEY, IV).decrypt(CIPHERTEXT)) == PLAINTEXT
+
+
+def test_cbc_decrypt_into_output_buffer_across_calls(backend):
+    out = bytearray(len(CIPHERTEXT))
+    view = memoryview(out)
+    decryptor = backend.cbc_decryptor(KEY, memoryview(IV))
+    # 分两次调用时 CBC 状态必须延续
+    assert decryptor.decrypt(memoryview(CIPHERTEXT)[:32], output=view[:32]) is None
+    assert decryptor.decrypt(memoryview(CIPHERTEXT)[32:], output=view[32:]) is None
+    assert bytes(out) == PLAINTEXT
+
+
+@pytest.mark.parametrize("key_hex, plaintext_hex, ciphertext_hex", [
+    # FIPS-197 附录 C.1 / C.2（单个分组，零 IV 的 CBC 即 ECB）
+    ("000102030405060708090a0b0c0d0e0f", "00112233445566778899aabbccddeeff", "69c4e0d86a7b0430d8cdb78070b4c55a"),
+    ("000102030405060708090a0b0c0d0e0f1011121314151617", "00112233445566778899aabbccddeeff",
+     "dda97ca4864cdfe06eaf70a0ec0d7191"),
+])
+def test_pure_aes_other_key_sizes(key_hex, plaintext_hex, ciphertext_hex):
+    key, plaintext, ciphertext = (bytes.fromhex(x) for x in (key_hex, plaintext_hex, ciphertext_hex))
+    zero_iv = bytes(16)
+    assert decrypt._PureCBC(key, zero_iv).encrypt(plaintext) == ciphertext
+    assert decrypt._PureCBC(key, zero_iv).decrypt(ciphertext) == plaintext
+
+
+def test_pbkdf2_known_answer(backend):
+    # RFC 7914 第 11 节的 PBKDF2-HMAC-SHA256 测试向量
+    expected = bytes.fromhex("55ac046e56e3089fec1691c22544b605f94185216dde0465e68b9d57c20dacbc"
+                             "49ca9cccf179b645991664b39d77ef317c71b845b1e30bd509112041d3a19783")
+    assert backend.pbkdf2_sha256(b"passwd", b"salt", 1, 64) == expected
+
+
+def test_pbkdf2_matches_hashlib(backend):
+    salt = bytes(range(16))
+    assert backend.pbkdf2_sha256(b"123456", memoryview(salt), 1000, 32) == \
+        hashlib.pbkdf2_hmac("sha256", b"123456", salt, 1000, dklen=32)
+
+
+def test_set_backend_and_info():
+    previous = decrypt.backend_info()["name"]
+    try:
+        assert decrypt.set_backend("pure") == "pure"
+        assert decrypt.get_backend().name == "pure"
+        assert decrypt.backend_info() == {"name": "pure", "selected_by": "explicit", "benchmark": None}
+        chosen = decrypt.set_backend("auto")
+        info = decrypt.backend_info()
+        assert info["selected_by"] == "auto" and chosen in info["benchmark"]
+        assert chosen != "pure" or BACKENDS == ["pure"]
+        with pytest.raises(ValueError):
+            decrypt.set_backend("no-such-backend")
+    finally:
+        decrypt.set_backend(previous or "auto")
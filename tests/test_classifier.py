@@ -0,0 +1,60 @@
+import decrypt
+from helpers import encrypt, random_bytes
+
+
+def test_encrypted_file_whose_salt_looks_like_magic_is_decrypted(tmp_path):
+    source = tmp_path / "src"
+    source.mkdir()
+    plaintext = random_bytes(3000)
+    data = encrypt(plaintext, salt=b"MZ" + bytes(range(14)))
+    (source / "program.bin").write_bytes(data)
+    output = tmp_path / "out"
+
+    ok, message = decrypt.decrypt_directory(str(source), output_dir=str(output), keep_original=True)
+
+    assert ok
+    assert "成功: 1" in message
+    assert (output / "program.bin").read_bytes() == plaintext
+
+
+def test_explicit_file_ignores_magic(tmp_path):
+    plaintext = random_bytes(100)
+    path = tmp_path / "archive.gz.enc"
+    path.write_bytes(encrypt(plaintext, salt=b"\x1f\x8b" + bytes(14)))
+
+    ok, message = decrypt.decrypt_file(str(path))
+
+    assert ok, message
+    assert (tmp_path / "archive.gz").read_bytes() == plaintext
+
+
+def test_plain_file_with_magic_is_copied_not_failed(tmp_path):
+    source = tmp_path / "src"
+    source.mkdir()
+    # 大小恰好满足 "文件头 + 整数个分组"，只能靠魔数区分
+    content = b"%PDF-1.7" + bytes(56)
+    (source / "doc.pdf").write_bytes(content)
+    output = tmp_path / "out"
+
+    ok, message = decrypt.decrypt_directory(str(source), output_dir=str(output), keep_original=True)
+
+    assert ok
+    assert "复制: 1" in message and "失败: 0" in message
+    assert (output / "doc.pdf").read_bytes() == content
+
+
+def test_truncated_encrypted_file_fails_and_stays_in_place(tmp_path):
+    source = tmp_path / "src"
+    source.mkdir()
+    data = encrypt(random_bytes(500))
+    (source / "good.enc").write_bytes(data)
+    (source / "foo.enc").write_bytes(data[:-5])
+    output = tmp_path / "out"
+
+    ok, message = decrypt.decrypt_directory(str(source), output_dir=str(output), keep_original=False,
+                                            classifier=decrypt.FileClassifier(encrypted_suffixes=[".enc"]))
+
+    assert ok
+    assert "成功: 1" in message and "失败: 1" in message and "复制: 0" in message
+    assert (source / "foo.enc").read_bytes() == data[:-5]
+    assert not (output / "foo.enc").exists()
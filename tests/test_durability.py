@@ -0,0 +1,180 @@
+import errno
+import os
+
+import pytest
+
+import decrypt
+from helpers import encrypt, random_bytes
+
+PLAINTEXT = random_bytes(5000)
+
+
+@pytest.fixture
+def encrypted(tmp_path):
+    path = tmp_path / "file.enc"
+    path.write_bytes(encrypt(PLAINTEXT))
+    return path
+
+
+def part_files(directory):
+    return [name for name in os.listdir(directory) if name.endswith(".part")]
+
+
+class EventLog(list):
+    """记录 fsync / 目录 fsync / 删除原始文件的顺序，删除时同时记录输出文件 output 是否已经在位"""
+
+    output = None
+
+
+@pytest.fixture
+def log(monkeypatch):
+    events = EventLog()
+    real_remove = os.remove
+    monkeypatch.setattr(os, "fsync", lambda fd: events.append("fsync"))
+    monkeypatch.setattr(os, "sync", lambda: events.append("sync"), raising=False)
+    monkeypatch.setattr(decrypt, "_fsync_dir", lambda path: events.append("fsync_dir"))
+
+    def remove(path):
+        events.append(("remove", os.path.basename(path), os.path.exists(events.output)))
+        real_remove(path)
+
+    monkeypatch.setattr(os, "remove", remove)
+    return events
+
+
+@pytest.mark.parametrize("mode, expected", [
+    ("none", [("remove", "file.enc", True)]),
+    ("file", ["fsync", "fsync_dir", ("remove", "file.enc", True)]),
+    ("batch", ["sync", ("remove", "file.enc", True)]),
+])
+def test_original_removed_only_after_output_is_committed(encrypted, log, mode, expected):
+    log.output = str(encrypted)[:-4]
+
+    ok, message = decrypt.decrypt_file(str(encrypted), durability=mode)
+
+    assert ok, message
+    assert list(log) == expected
+    assert not encrypted.exists()
+    assert (encrypted.parent / "file").read_bytes() == PLAINTEXT
+    assert part_files(encrypted.parent) == []
+
+
+def test_batch_mode_defers_removal_until_flush(encrypted):
+    durability = decrypt.Durability("batch", batch_files=1000, batch_seconds=3600)
+    selector = decrypt.PasswordSelector(["123456"])
+
+    outcome, _, _ = decrypt._decrypt_file(str(encrypted), None, selector, durability=durability)
+
+    assert outcome == "success"
+    assert (encrypted.parent / "file").read_bytes() == PLAINTEXT
+    assert encrypted.exists()
+    durability.flush()
+    assert not encrypted.exists()
+
+
+def test_batch_mode_flushes_when_batch_is_full(tmp_path):
+    durability = decrypt.Durability("batch", batch_files=2, batch_seconds=3600)
+    selector = decrypt.PasswordSelector(["123456"])
+    paths = []
+    for i in range(3):
+        path = tmp_path / f"f{i}.enc"
+        path.write_bytes(encrypt(PLAINTEXT, seed=i))
+        paths.append(path)
+        assert decrypt._decrypt_file(str(path), None, selector, durability=durability)[0] == "success"
+
+    assert [path.exists() for path in paths] == [False, False, True]
+    durability.flush()
+    assert not paths[2].exists()
+
+
+@pytest.mark.parametrize("mode", decrypt.Durability.MODES)
+def test_failed_decrypt_leaves_no_part_file_and_keeps_existing_output(encrypted, monkeypatch, mode):
+    output = encrypted.parent / "file"
+    output.write_bytes(b"previous output")
+
+    def broken(encrypted_data, dst, *args, **kwargs):
+        dst.write(b"partial plaintext")
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(decrypt, "decrypt_buffer", broken)
+    monkeypatch.setattr(decrypt, "decrypt_stream", broken)
+
+    ok, _ = decrypt.decrypt_file(str(encrypted), durability=mode)
+
+    assert not ok
+    assert output.read_bytes() == b"previous output"
+    assert encrypted.exists()
+    assert part_files(encrypted.parent) == []
+
+
+def test_wrong_password_writes_nothing(encrypted):
+    ok, _ = decrypt.decrypt_file(str(encrypted), password="wrong", durability="file")
+
+    assert not ok
+    assert sorted(os.listdir(encrypted.parent)) == ["file.enc"]
+
+
+def test_transfer_renames_when_not_keeping_original(tmp_path):
+    src, dst = tmp_path / "a.txt", tmp_path / "out.txt"
+    src.write_bytes(b"plain")
+
+    assert decrypt.transfer_plain_file(str(src), str(dst)) == "rename"
+    assert not src.exists()
+    assert dst.read_bytes() == b"plain"
+
+
+def test_transfer_hardlinks_and_replaces_existing_output(tmp_path):
+    src, dst = tmp_path / "a.txt", tmp_path / "out.txt"
+    src.write_bytes(b"plain")
+    dst.write_bytes(b"stale")
+
+    assert decrypt.transfer_plain_file(str(src), str(dst), keep_original=True, hardlink=True) == "link"
+    assert src.exists()
+    assert os.path.samefile(src, dst)
+
+
+def test_transfer_copies_when_keeping_original(tmp_path):
+    src, dst = tmp_path / "a.txt", tmp_path / "out.txt"
+    src.write_bytes(b"plain" * 1000)
+    os.chmod(src, 0o640)
+
+    assert decrypt.transfer_plain_file(str(src), str(dst), keep_original=True) == "copy"
+    assert src.exists() and not os.path.samefile(src, dst)
+    assert dst.read_bytes() == b"plain" * 1000
+    assert os.stat(dst).st_mode & 0o777 == 0o640
+    assert part_files(tmp_path) == []
+
+
+def test_transfer_falls_back_to_copy_when_link_fails(tmp_path, monkeypatch):
+    src, dst = tmp_path / "a.txt", tmp_path / "out.txt"
+    src.write_bytes(b"plain")
+
+    def no_link(*args):
+        raise OSError(errno.EPERM, "Operation not permitted")
+
+    monkeypatch.setattr(os, "link", no_link)
+
+    assert decrypt.transfer_plain_file(str(src), str(dst), keep_original=True, hardlink=True) == "copy"
+    assert src.exists()
+    assert dst.read_bytes() == b"plain"
+
+
+def test_cross_device_move_copies_then_removes_after_batch_flush(tmp_path, monkeypatch):
+    src, dst = tmp_path / "a.txt", tmp_path / "out.txt"
+    src.write_bytes(b"plain")
+    real_replace = os.replace
+
+    def replace(a, b):
+        if a == str(src):
+            raise OSError(errno.EXDEV, "Invalid cross-device link")
+        real_replace(a, b)
+
+    monkeypatch.setattr(os, "replace", replace)
+    durability = decrypt.Durability("batch", batch_files=1000, batch_seconds=3600)
+
+    assert decrypt.transfer_plain_file(str(src), str(dst), durability=durability) == "copy"
+    assert dst.read_bytes() == b"plain"
+    assert src.exists()
+    durability.flush()
+    assert not src.exists()
+    assert part_files(tmp_path) == []
@@ -0,0 +1,104 @@
+import os
+
+import pytest
+
+import decrypt
+from helpers import encrypt, random_bytes
+
+
+@pytest.fixture
+def tree(tmp_path):
+    source = tmp_path / "src"
+    source.mkdir()
+    (source / "a.enc").write_bytes(encrypt(random_bytes(1000, seed=1), seed=1))
+    # 用另一个密码加密：第一次运行失败，续传时提供该密码后应重试成功
+    (source / "b.enc").write_bytes(encrypt(random_bytes(1000, seed=2), "other", seed=2))
+    return source, tmp_path / "out", str(source / ".progress.db")
+
+
+def run(source, output, journal, resume=False, passwords=None):
+    processed = {}
+    ok, message = decrypt.decrypt_directory(
+        str(source), output_dir=str(output), keep_original=True, journal=journal, resume=resume,
+        passwords=passwords,
+        file_callback=lambda path, outcome, label: processed.update({os.path.basename(path): outcome}))
+    assert ok, message
+    return processed, message
+
+
+def test_journal_files_inside_tree_are_ignored(tree):
+    source, output, journal = tree
+
+    processed, message = run(source, output, journal)
+
+    assert processed == {"a.enc": "success", "b.enc": "failed"}
+    assert message.startswith("处理完成! 成功: 1, 失败: 1, 复制: 0, 跳过: 0")
+    assert sorted(os.listdir(output)) == ["a.enc"]
+
+
+def test_resume_skips_done_files_and_retries_failures(tree):
+    source, output, journal = tree
+    run(source, output, journal)
+
+    processed, message = run(source, output, journal, resume=True, passwords=["123456", "other"])
+
+    assert processed == {"b.enc": "success"}
+    assert "续传跳过: 1" in message
+    assert (output / "b.enc").read_bytes() == random_bytes(1000, seed=2)
+
+
+@pytest.mark.parametrize("change", ["content", "mtime"])
+def test_resume_reprocesses_changed_files(tree, change):
+    source, output, journal = tree
+    run(source, output, journal)
+    a = source / "a.enc"
+    if change == "content":
+        a.write_bytes(encrypt(random_bytes(3000, seed=3), seed=3))
+    else:
+        stat = os.stat(a)
+        os.utime(a, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    processed, _ = run(source, output, journal, resume=True)
+
+    assert processed == {"a.enc": "success", "b.enc": "failed"}
+    expected = random_bytes(3000, seed=3) if change == "content" else random_bytes(1000, seed=1)
+    assert (output / "a.enc").read_bytes() == expected
+
+
+def test_run_without_resume_resets_journal(tree, tmp_path):
+    source, output, journal = tree
+    run(source, output, journal)
+    # a.enc 暂时移出目录树（重命名保留修改时间），不带 resume 的运行只会处理 b.enc
+    os.rename(source / "a.enc", tmp_path / "a.enc")
+
+    processed, message = run(source, output, journal)
+    assert processed == {"b.enc": "failed"}
+    assert "续传跳过" not in message
+
+    # 日志已被重置，a.enc 的旧记录不复存在：移回后续传必须重新处理它
+    os.rename(tmp_path / "a.enc", source / "a.enc")
+    processed, _ = run(source, output, journal, resume=True)
+    assert processed == {"a.enc": "success", "b.enc": "failed"}
+
+
+def test_batch_journal_records_only_unchanged_successes(tmp_path):
+    journal = decrypt.BatchJournal(str(tmp_path / "j.db"))
+    try:
+        journal.record("/x/a", 10, 100, "success")
+        journal.record("/x/b", 10, 100, "failed")
+        journal.commit()
+    finally:
+        journal.close()
+
+    reopened = decrypt.BatchJournal(str(tmp_path / "j.db"))
+    try:
+        assert reopened.is_done("/x/a", 10, 100)
+        assert not reopened.is_done("/x/a", 11, 100)
+        assert not reopened.is_done("/x/a", 10, 101)
+        assert not reopened.is_done("/x/b", 10, 100)
+        assert reopened.owns(str(tmp_path / "j.db-wal")) and reopened.owns(str(tmp_path / "j.db-shm"))
+        assert not reopened.owns(str(tmp_path / "other.db-wal"))
+        reopened.reset()
+        assert not reopened.is_done("/x/a", 10, 100)
+    finally:
+        reopened.close()
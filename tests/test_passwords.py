@@ -0,0 +1,80 @@
+import pytest
+
+import decrypt
+from helpers import colliding_file, encrypt, random_bytes
+
+
+def test_constructed_collision_passes_both_padding_checks(tmp_path):
+    data, _ = colliding_file("right", "wrong")
+    path = tmp_path / "victim.enc"
+    path.write_bytes(data)
+    assert decrypt.verify_password(str(path), "right")
+    assert decrypt.verify_password(str(path), "wrong")
+
+
+def test_ambiguous_candidates_fail_and_keep_original(tmp_path):
+    data, _ = colliding_file("right", "wrong")
+    path = tmp_path / "victim.enc"
+    path.write_bytes(data)
+
+    ok, message = decrypt.decrypt_file(str(path), passwords=["wrong", "right"])
+
+    assert not ok
+    assert "多个候选密码" in message
+    assert path.read_bytes() == data
+    assert not (tmp_path / "victim").exists()
+
+
+def test_ambiguous_candidates_in_directory_are_failures(tmp_path):
+    data, _ = colliding_file("right", "wrong")
+    (tmp_path / "victim.enc").write_bytes(data)
+    output = tmp_path / "out"
+
+    ok, message = decrypt.decrypt_directory(str(tmp_path), passwords=["wrong", "right"], output_dir=str(output),
+                                            keep_original=False)
+
+    assert ok
+    assert "失败: 1" in message
+    assert (tmp_path / "victim.enc").read_bytes() == data
+    assert not (output / "victim.enc").exists()
+
+
+def test_unique_candidate_is_selected(tmp_path):
+    plaintext = random_bytes(1000)
+    path = tmp_path / "file.enc"
+    path.write_bytes(encrypt(plaintext, "second", seed=1))
+
+    ok, message = decrypt.decrypt_file(str(path), passwords=["first", "second"])
+
+    assert ok, message
+    assert message.endswith("(密码 #2)")
+    assert (tmp_path / "file").read_bytes() == plaintext
+    assert not path.exists()
+
+
+def test_selector_reports_ambiguity(tmp_path):
+    data, _ = colliding_file("right", "wrong")
+    path = tmp_path / "victim.enc"
+    path.write_bytes(data)
+    selector = decrypt.PasswordSelector(["wrong", "right"])
+
+    with open(path, "rb") as f:
+        assert selector.matches_open(f, len(data)) == ["wrong", "right"]
+        password, reason = selector.select_open(f, len(data))
+    assert password is None
+    assert "#1, #2" in reason
+    assert selector.select(str(path)) is None
+
+
+def test_reader_refuses_ambiguous_file(tmp_path):
+    data, _ = colliding_file("right", "wrong")
+    path = tmp_path / "victim.enc"
+    path.write_bytes(data)
+    with pytest.raises(ValueError):
+        decrypt.DecryptedReader(str(path), passwords=["wrong", "right"])
+
+
+def test_password_file_strips_utf8_bom(tmp_path):
+    path = tmp_path / "passwords.txt"
+    path.write_bytes("\ufeff第一个\r\nsecond\r\n\r\n".encode("utf-8"))
+    assert decrypt.load_password_file(str(path)) == ["第一个", "second"]
@@ -0,0 +1,41 @@
+import threading
+
+import decrypt
+from helpers import encrypt, random_bytes
+
+
+def test_concurrent_segment_reports_never_overshoot_total():
+    progress = decrypt.BatchProgress()
+    file_size = 8 * 1000 * 16
+    progress.add_discovered(file_size)
+    file_progress = decrypt._FileProgress(decrypt.NO_STATS, progress)
+
+    def segment():
+        for _ in range(1000):
+            file_progress.record('aes', 0.0, 16)
+
+    threads = [threading.Thread(target=segment) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    file_progress.file_done(file_size)
+
+    snapshot = progress.snapshot()
+    assert snapshot['bytes_done'] == snapshot['bytes_total'] == file_size
+    assert snapshot['files_done'] == 1
+
+
+def test_parallel_decrypt_progress_matches_file_size(tmp_path):
+    plaintext = random_bytes(64 * 1024 + 7)
+    data = encrypt(plaintext)
+    progress = decrypt.BatchProgress()
+    progress.add_discovered(len(data))
+    file_progress = decrypt._FileProgress(decrypt.NO_STATS, progress)
+
+    with open(tmp_path / "out", "wb") as dst:
+        decrypt.decrypt_parallel(data, dst, workers=4, segment_size=4096, chunk_size=1024, stats=file_progress)
+    file_progress.file_done(len(data))
+
+    assert (tmp_path / "out").read_bytes() == plaintext
+    assert progress.snapshot()['bytes_done'] == len(data)
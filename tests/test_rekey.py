@@ -0,0 +1,97 @@
+import io
+import os
+
+import pytest
+
+import decrypt
+from helpers import colliding_file, encrypt, random_bytes
+
+
+@pytest.mark.parametrize("size", [0, 15, 16, 17, 4096 - 16, 4096, 4096 + 16, 100000])
+def test_rekey_stream_round_trip(size):
+    plaintext = random_bytes(size)
+    out = io.BytesIO()
+    decrypt.rekey_stream(io.BytesIO(encrypt(plaintext, "old")), out, "old", "new", chunk_size=4096)
+    assert bytes(decrypt.decrypt_data(out.getvalue(), "new")) == plaintext
+
+
+def test_rekey_file_in_place(tmp_path):
+    plaintext = random_bytes(5000)
+    path = tmp_path / "file.enc"
+    path.write_bytes(encrypt(plaintext, "old"))
+    os.chmod(path, 0o600)
+
+    assert decrypt.rekey_file(str(path), "old", "new") == (True, "重新加密成功")
+    assert bytes(decrypt.decrypt_data(path.read_bytes(), "new")) == plaintext
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    assert decrypt.rekey_file(str(path), "old", "new") == (True, "已使用新密码")
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_rekey_file_batch_durability_is_flushed(tmp_path, monkeypatch):
+    syncs = []
+    monkeypatch.setattr(os, "sync", lambda: syncs.append(True), raising=False)
+    plaintext = random_bytes(700)
+    path = tmp_path / "rk.enc"
+    path.write_bytes(encrypt(plaintext, "old"))
+    durability = decrypt.Durability('batch', batch_files=1000, batch_seconds=3600)
+
+    assert decrypt.rekey_file(str(path), "old", "new", durability=durability) == (True, "重新加密成功")
+    assert syncs and durability._pending == []
+    assert durability.errors == []
+    assert bytes(decrypt.decrypt_data(path.read_bytes(), "new")) == plaintext
+
+
+def test_truncated_file_is_a_rekey_failure(tmp_path):
+    data = encrypt(random_bytes(700), "old")
+    path = tmp_path / "cut.enc"
+    path.write_bytes(data[:-5])
+
+    ok, message = decrypt.rekey_file(str(path), "old", "new")
+
+    assert not ok
+    assert "截断" in message
+    assert path.read_bytes() == data[:-5]
+
+
+def test_ambiguous_old_candidates_leave_file_untouched(tmp_path):
+    data, _ = colliding_file("right", "wrong")
+    path = tmp_path / "victim.enc"
+    path.write_bytes(data)
+
+    ok, message = decrypt.rekey_file(str(path), None, "new", passwords=["wrong", "right"])
+
+    assert not ok
+    assert "多个旧密码" in message
+    assert path.read_bytes() == data
+
+
+def test_file_passing_old_and_new_password_is_not_skipped_or_rewritten(tmp_path):
+    data, _ = colliding_file("old", "new")
+    path = tmp_path / "victim.enc"
+    path.write_bytes(data)
+
+    ok, message = decrypt.rekey_file(str(path), "old", "new")
+
+    assert not ok
+    assert "新密码和旧密码" in message
+    assert path.read_bytes() == data
+
+
+def test_rekey_directory_reports_ambiguous_files_as_failed(tmp_path):
+    plaintext = random_bytes(300)
+    (tmp_path / "good.enc").write_bytes(encrypt(plaintext, "right", seed=2))
+    collision, _ = colliding_file("right", "wrong")
+    (tmp_path / "victim.enc").write_bytes(collision)
+    (tmp_path / "readme.txt").write_bytes(b"hello")
+    outcomes = {}
+
+    ok, message = decrypt.rekey_directory(str(tmp_path), None, "new", passwords=["wrong", "right"],
+                                          file_callback=lambda path, outcome, label: outcomes.update(
+                                              {os.path.basename(path): (outcome, label)}))
+
+    assert ok
+    assert outcomes == {"good.enc": ("success", "#2"), "victim.enc": ("failed", None),
+                        "readme.txt": ("skipped", None)}
+    assert bytes(decrypt.decrypt_data((tmp_path / "good.enc").read_bytes(), "new")) == plaintext
+    assert (tmp_path / "victim.enc").read_bytes() == collision
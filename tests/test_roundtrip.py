@@ -0,0 +1,81 @@
+import io
+import os
+
+import pytest
+
+import decrypt
+from helpers import encrypt, random_bytes
+
+CHUNK = 4096
+SIZES = [0, 15, 16, 17, CHUNK - 16, CHUNK, CHUNK + 16, 3 * CHUNK + 5]
+
+
+@pytest.fixture(params=decrypt.available_backends(), autouse=True)
+def backend(request):
+    previous = decrypt.backend_info()["name"]
+    decrypt.set_backend(request.param)
+    yield request.param
+    decrypt.set_backend(previous or "auto")
+
+
+@pytest.fixture(params=SIZES)
+def sample(request):
+    plaintext = random_bytes(request.param)
+    return plaintext, encrypt(plaintext, seed=request.param)
+
+
+def test_decrypt_data(sample):
+    plaintext, data = sample
+    assert bytes(decrypt.decrypt_data(data)) == plaintext
+
+
+def test_decrypt_stream(sample):
+    plaintext, data = sample
+    out = io.BytesIO()
+    assert decrypt.decrypt_stream(io.BytesIO(data), out, chunk_size=CHUNK) == len(plaintext)
+    assert out.getvalue() == plaintext
+
+
+def test_decrypt_buffer(sample):
+    plaintext, data = sample
+    out = io.BytesIO()
+    assert decrypt.decrypt_buffer(data, out, chunk_size=CHUNK) == len(plaintext)
+    assert out.getvalue() == plaintext
+
+
+def test_decrypt_pipelined(sample):
+    plaintext, data = sample
+    out = io.BytesIO()
+    assert decrypt.decrypt_pipelined(io.BytesIO(data), out, chunk_size=CHUNK, depth=2) == len(plaintext)
+    assert out.getvalue() == plaintext
+
+
+def test_decrypt_parallel(sample, tmp_path):
+    plaintext, data = sample
+    path = tmp_path / "out"
+    with open(path, "wb") as dst:
+        written = decrypt.decrypt_parallel(data, dst, workers=3, segment_size=2 * CHUNK, chunk_size=CHUNK)
+    assert written == len(plaintext)
+    assert path.read_bytes() == plaintext
+
+
+def test_decrypted_reader(sample, tmp_path):
+    plaintext, data = sample
+    path = tmp_path / "file.enc"
+    path.write_bytes(data)
+    with decrypt.DecryptedReader(str(path), page_size=1024, cache_pages=2) as reader:
+        assert reader.size == len(plaintext)
+        assert reader.read() == plaintext
+        for offset in (0, 15, 16, 17, 1023, 1024, len(plaintext) - 1):
+            if 0 <= offset < len(plaintext):
+                reader.seek(offset)
+                assert reader.read(40) == plaintext[offset:offset + 40]
+        tail = min(5, len(plaintext))
+        reader.seek(-tail, os.SEEK_END)
+        assert reader.read() == plaintext[len(plaintext) - tail:]
+
+
+def test_wrong_password_rejected(sample):
+    _, data = sample
+    with pytest.raises(ValueError):
+        decrypt.decrypt_stream(io.BytesIO(data), io.BytesIO(), "not the password", chunk_size=CHUNK)
@@ -0,0 +1,69 @@
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import decrypt
+from helpers import encrypt, random_bytes
+
+
+@pytest.fixture
+def served(tmp_path):
+    server = decrypt.serve_directory(str(tmp_path), host="127.0.0.1", port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{server.server_address[1]}/"
+    yield tmp_path, base
+    server.shutdown()
+    server.server_close()
+
+
+def fetch(url, headers=None):
+    with urllib.request.urlopen(urllib.request.Request(url, headers=headers or {})) as response:
+        return response.status, response.read()
+
+
+def test_encrypted_file_is_decrypted_with_range(served):
+    root, base = served
+    plaintext = random_bytes(200000)
+    (root / "video.mp4.enc").write_bytes(encrypt(plaintext))
+
+    assert fetch(base + "video.mp4") == (200, plaintext)
+    assert fetch(base + "video.mp4", {"Range": "bytes=1000-1999"}) == (206, plaintext[1000:2000])
+
+
+def test_block_aligned_plain_file_is_served_as_is(served):
+    root, base = served
+    content = b"x" * 64
+    (root / "notes.txt").write_bytes(content)
+
+    assert fetch(base + "notes.txt") == (200, content)
+
+
+def test_undecryptable_enc_file_is_forbidden(served):
+    root, base = served
+    (root / "other.enc").write_bytes(encrypt(b"secret", "another password"))
+
+    with pytest.raises(urllib.error.HTTPError) as excinfo:
+        fetch(base + "other.enc")
+    assert excinfo.value.code == 403
+
+
+def test_listing_keeps_suffix_when_names_collide(served):
+    root, base = served
+    (root / "x").write_bytes(b"plain")
+    (root / "x.enc").write_bytes(encrypt(b"decrypted"))
+    (root / "y.enc").write_bytes(encrypt(b"y"))
+
+    _, body = fetch(base)
+    assert b'href="x"' in body and b'href="x.enc"' in body and b'href="y"' in body
+    assert fetch(base + "x") == (200, b"plain")
+    assert fetch(base + "x.enc") == (200, b"decrypted")
+
+
+def test_requests_are_not_logged_to_stderr(served, capfd):
+    root, base = served
+    (root / "a.txt").write_bytes(b"a")
+    fetch(base + "a.txt")
+    assert capfd.readouterr().err == ""